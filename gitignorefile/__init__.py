@@ -1,37 +1,69 @@
 """A spec-compliant `.gitignore` parser for Python."""
 
 import collections
+import errno
+import io
+import itertools
+import marshal
 import os
 import re
+import stat
+import struct
+import sys
+import threading
+import time
 
 
 DEFAULT_IGNORE_NAMES = [".gitignore", ".git/info/exclude"]
 
 
-def parse(path, base_path=None):
+def parse(path, base_path=None, engine="re"):
     """Parses single `.gitignore` file.
 
     Args:
         path (str): Path to `.gitignore` file.
         base_path (str): Base path for applying ignore rules.
+        engine (str, optional): Matching engine, see `IgnoreSpec.from_lines()`.
 
     Returns:
-        Callable[[str], bool]: Callable which returns `True` if specified path is ignored.
+        IgnoreSpec: Callable which returns `True` if specified path is ignored.
             You can also pass `is_dir: bool` optional parameter if you know whether the specified path is a directory.
     """
 
-    if base_path is None:
-        base_path = os.path.dirname(path) or os.path.dirname(os.path.abspath(path))
+    return IgnoreSpec.from_file(path, base_path=base_path, engine=engine)
 
-    rules = []
-    with open(path) as ignore_file:
-        for line in ignore_file:
-            line = line.rstrip("\r\n")
-            rule = _rule_from_pattern(line)
-            if rule:
-                rules.append(rule)
 
-    return _IgnoreRules(rules, base_path).match
+def parse_lines(lines, base_path, engine="re"):
+    """Parses lines of ignore file.
+
+    Args:
+        lines (Iterable[str | bytes]): Lines of ignore file, e.g. a file object. Bytes are decoded as UTF-8, and
+            invalid bytes are kept as surrogates, see `from_lines()`.
+        base_path (str): Base path for applying ignore rules.
+        engine (str, optional): Matching engine, see `IgnoreSpec.from_lines()`.
+
+    Returns:
+        IgnoreSpec: Callable which returns `True` if specified path is ignored.
+    """
+
+    return IgnoreSpec.from_lines(lines, base_path, engine=engine)
+
+
+def parse_bytes(data, base_path, engine="re"):
+    """Parses contents of ignore file.
+
+    Lines are split lazily, without copying the whole buffer. Bytes are decoded as UTF-8, see `IgnoreSpec.from_lines()`.
+
+    Args:
+        data (bytes | bytearray | memoryview | mmap.mmap): Contents of ignore file.
+        base_path (str): Base path for applying ignore rules.
+        engine (str, optional): Matching engine, see `IgnoreSpec.from_lines()`.
+
+    Returns:
+        IgnoreSpec: Callable which returns `True` if specified path is ignored.
+    """
+
+    return IgnoreSpec.from_lines((m.group() for m in _line_expr.finditer(data)), base_path, engine=engine)
 
 
 def ignore(ignore_names=DEFAULT_IGNORE_NAMES):
@@ -50,12 +82,304 @@ def ignore(ignore_names=DEFAULT_IGNORE_NAMES):
     return lambda root, names: {name for name in names if matches(os.path.join(root, name))}
 
 
+def copytree(
+    src,
+    dst,
+    *,
+    ignore_names=DEFAULT_IGNORE_NAMES,
+    symlinks=False,
+    ignore_dangling_symlinks=False,
+    dirs_exist_ok=False,
+    workers=None,
+):
+    """Copies the directory tree without ignored files, like `shutil` does.
+
+    Ignored directories are not entered. Directories are created while the tree is walked, and files are copied by
+    a pool of threads. Contents of files are copied by the kernel with `os.copy_file_range()` or `os.sendfile()` where
+    available. Like `shutil.copy2()`, permission bits, timestamps and other metadata are copied as well. If the
+    destination is inside the source directory, it is not copied into itself. Like in `shutil`, named pipes and other
+    special files are not copied, but reported as errors.
+
+    Args:
+        src (str | bytes): Source directory.
+        dst (str | bytes): Destination directory.
+        ignore_names (list[str], optional): List of names of ignore files.
+        symlinks (bool, optional): Copy symbolic links as links. Otherwise files and directories they point to are
+            copied.
+        ignore_dangling_symlinks (bool, optional): Skip symbolic links which point to nothing if `symlinks` is not set.
+        dirs_exist_ok (bool, optional): Do not fail if directories already exist.
+        workers (int, optional): Number of threads copying files, see `concurrent.futures.ThreadPoolExecutor`.
+
+    Returns:
+        str | bytes: Destination directory.
+
+    Raises:
+        shutil.Error: With list of tuples `(src, dst, reason)` if some files could not be copied.
+    """
+
+    import concurrent.futures
+    import shutil
+
+    matches = Cache(ignore_names=ignore_names)
+    errors = []
+    directories = []  # Copied directories, their metadata is copied when their contents are.
+
+    def copy(src_path, dst_path, link):
+        try:
+            if link:
+                os.symlink(os.readlink(src_path), dst_path)
+                shutil.copystat(src_path, dst_path, follow_symlinks=False)
+
+            else:
+                _copy_file(src_path, dst_path)
+                shutil.copystat(src_path, dst_path)
+
+        except OSError as e:
+            errors.append((src_path, dst_path, str(e)))
+
+    os.makedirs(dst, exist_ok=dirs_exist_ok)
+    dst_inode = os.stat(dst).st_ino
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        stack = [(src, dst)]
+        while stack:
+            src_directory, dst_directory = stack.pop()
+            directories.append((src_directory, dst_directory))
+            try:
+                with os.scandir(src_directory) as entries:
+                    entries = [
+                        (
+                            entry.name,
+                            entry.is_dir(follow_symlinks=False),
+                            entry.is_file(follow_symlinks=False),
+                            entry.is_symlink(),
+                            entry.inode(),
+                        )
+                        for entry in entries
+                    ]
+
+            except OSError as e:
+                errors.append((src_directory, dst_directory, str(e)))
+                continue
+
+            for name, is_dir, is_file, is_link, inode in entries:
+                src_path = os.path.join(src_directory, name)
+                dst_path = os.path.join(dst_directory, name)
+                if matches(src_path, is_dir=is_dir):  # Like Git, symbolic links are files.
+                    continue
+
+                if is_dir and inode == dst_inode and os.path.samefile(src_path, dst):
+                    continue  # The destination is inside the source directory.
+
+                if is_link and not symlinks:
+                    if not os.path.exists(src_path):
+                        if ignore_dangling_symlinks:
+                            continue
+
+                        is_file = True  # Copying fails, and the error is reported like in `shutil`.
+
+                    else:
+                        is_dir, is_file = os.path.isdir(src_path), os.path.isfile(src_path)
+
+                if is_dir:
+                    try:
+                        os.makedirs(dst_path, exist_ok=dirs_exist_ok)
+
+                    except OSError as e:
+                        errors.append((src_path, dst_path, str(e)))
+                        continue
+
+                    stack.append((src_path, dst_path))
+
+                elif not is_file and not (is_link and symlinks):
+                    # Like `shutil`, pipes, sockets and devices are reported instead of being read, which could block.
+                    try:
+                        kind = "a named pipe" if stat.S_ISFIFO(os.stat(src_path).st_mode) else "not a regular file"
+                        errors.append((src_path, dst_path, f"`{os.fsdecode(src_path)}` is {kind}"))
+
+                    except OSError as e:
+                        errors.append((src_path, dst_path, str(e)))
+
+                else:
+                    if len(pending) >= _max_pending_copies:
+                        done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                        for future in done:
+                            future.result()  # Errors other than `OSError` are raised.
+
+                    pending.add(executor.submit(copy, src_path, dst_path, is_link and symlinks))
+
+    for future in pending:
+        future.result()
+
+    for src_directory, dst_directory in reversed(directories):
+        try:
+            shutil.copystat(src_directory, dst_directory)
+
+        except OSError as e:
+            errors.append((src_directory, dst_directory, str(e)))
+
+    if errors:
+        raise shutil.Error(errors)
+
+    return dst
+
+
+def archive(path, output, format="tar", arcname=None, ignore_names=DEFAULT_IGNORE_NAMES):
+    """Writes the directory tree without ignored files to archive.
+
+    Ignored directories and `.git` are not entered, like in `git archive`. Files are streamed to the archive without
+    temporary copies. They are read in a background thread while the archive is compressed and written. Small files are
+    read ahead, and large ones are copied in chunks, so memory usage does not depend on the size of the tree. Entries
+    are sorted by name. Symbolic links are stored as links. Sockets are skipped, and so are pipes and devices in `.zip`
+    archives, which could not store them.
+
+    Args:
+        path (str | os.PathLike): Root of the directory tree.
+        output (str | os.PathLike | BinaryIO | tarfile.TarFile | zipfile.ZipFile): Path to the archive, writable
+            binary stream, or opened archive, which is not closed.
+        format (str, optional): `"tar"`, `"gztar"`, `"bztar"`, `"xztar"` or `"zip"`, like in `shutil.make_archive()`.
+            Format of opened archive is used instead if it is given.
+        arcname (str, optional): Name of the root directory in the archive. Entries are at the top level if not set.
+        ignore_names (list[str], optional): List of names of ignore files.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+
+    import tarfile
+    import zipfile
+
+    if isinstance(output, (tarfile.TarFile, zipfile.ZipFile)):
+        _write_archive(path, output, arcname, ignore_names)
+        return
+
+    if format not in _archive_modes:
+        raise ValueError(f"Unknown archive format: {format!r}")
+
+    stream = hasattr(output, "write")
+    if format == "zip":
+        opened = zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED)
+
+    else:
+        opened = tarfile.open(
+            fileobj=output if stream else None, name=None if stream else output, mode=_archive_modes[format]
+        )
+
+    with opened:
+        _write_archive(path, opened, arcname, ignore_names)
+
+
+def fingerprint(path, digests=None, ignore_names=DEFAULT_IGNORE_NAMES, algorithm="sha256", workers=None):
+    """Hashes the directory tree without ignored files, e.g. for keys of build caches.
+
+    Ignored directories and `.git` are not entered, and files are hashed by a pool of threads. Hash of each directory
+    is computed from names, types and hashes of its entries, like Git trees are, so the hash changes when some file
+    which is not ignored is added, removed, renamed, changed or made executable. Unlike in Git, directories which are
+    not ignored are hashed even if they are empty, so adding or removing them changes the hash as well. Symbolic links
+    are not followed, their targets are hashed instead.
+
+    Digests of files could be kept between runs, so only changed files are read. They are looked up by inode number,
+    size and modification time of the file. Digests of files which are modified too recently are not kept, since
+    further changes would not change their modification times. Hashes of directories are not kept: modification time
+    of a directory does not change when files inside it do, so every directory is listed again on each run.
+
+    Args:
+        path (str | bytes): Root of the directory tree.
+        digests (dict, optional): Digests of files from the previous run with the same algorithm. It is updated to hold
+            digests of the files of the tree, so it could be saved with `marshal` or `pickle` for the next run.
+        ignore_names (list[str], optional): List of names of ignore files.
+        algorithm (str, optional): Name of the hash algorithm, see `hashlib.new()`.
+        workers (int, optional): Number of threads hashing files, see `concurrent.futures.ThreadPoolExecutor`.
+
+    Returns:
+        str: Hexadecimal hash of the tree.
+    """
+
+    import concurrent.futures
+    import hashlib
+
+    matches = Cache(ignore_names=ignore_names)
+    known = digests or {}
+    kept = {}
+    racy = (time.time() - _racy_interval) * 10**9
+    directories = []  # Directories along with their entries, parents go first.
+    batch = []  # Small files are hashed in batches, so there are fewer tasks.
+    batch_size = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        stack = [path]
+        while stack:
+            directory = stack.pop()
+            entries = []
+            directories.append((directory, entries))
+            with os.scandir(directory) as scanned:
+                scanned = list(scanned)
+
+            for entry in scanned:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if entry.name in _git_names or matches(entry.path, is_dir=is_dir):
+                    continue
+
+                name = os.fsencode(entry.name)
+                if is_dir:
+                    entries.append((name, b"d", entry.path))
+                    stack.append(entry.path)
+                    continue
+
+                if entry.is_symlink():
+                    entries.append((name, b"l", hashlib.new(algorithm, os.fsencode(os.readlink(entry.path))).digest()))
+                    continue
+
+                entry_stat = entry.stat(follow_symlinks=False)
+                if not stat.S_ISREG(entry_stat.st_mode):  # Sockets and other special files.
+                    continue
+
+                key = (entry.inode(), entry_stat.st_size, entry_stat.st_mtime_ns)
+                digest = known.get(key)
+                if digest is None:
+                    digest = [len(batch), None]  # Index in the batch and the batch, which is set when it is submitted.
+                    batch.append((entry.path, digest))
+                    batch_size += entry_stat.st_size
+                    if len(batch) >= _max_hash_batch_files or batch_size >= _max_hash_batch_size:
+                        _submit_hash_batch(executor, batch, algorithm)
+                        batch, batch_size = [], 0
+
+                if entry_stat.st_mtime_ns < racy:
+                    kept[key] = digest
+
+                entries.append((name, b"x" if entry_stat.st_mode & stat.S_IXUSR else b"f", digest))
+
+        _submit_hash_batch(executor, batch, algorithm)
+
+    hashes = {}
+    for directory, entries in reversed(directories):
+        tree = hashlib.new(algorithm)
+        for name, kind, digest in sorted(entries):
+            if kind == b"d":
+                digest = hashes.pop(digest)
+
+            elif isinstance(digest, list):
+                digest = digest[1].result()[digest[0]]
+
+            tree.update(b"%s %s\0%s" % (kind, name, digest))
+
+        hashes[directory] = tree.digest()
+
+    if digests is not None:
+        digests.clear()
+        digests.update(
+            (key, digest[1].result()[digest[0]] if isinstance(digest, list) else digest) for key, digest in kept.items()
+        )
+
+    return hashes[path].hex()
+
+
 def ignored(path, is_dir=None, ignore_names=DEFAULT_IGNORE_NAMES):
     """Checks if file is ignored by any `.gitignore` in the directory tree.
 
     Args:
-        path (str): Path to check against ignore rules.
-        is_dir (bool, optional): Set if you know whether the specified path is a directory.
+        path (str | bytes | os.PathLike): Path to check against ignore rules.
+        is_dir (bool | Callable[[], bool] | os.DirEntry, optional): Set if you know whether the specified path is a
+            directory, or how to find it out.
         ignore_names (list[str], optional): List of names of ignore files.
 
     Returns:
@@ -65,100 +389,1201 @@ def ignored(path, is_dir=None, ignore_names=DEFAULT_IGNORE_NAMES):
     return Cache(ignore_names=ignore_names)(path, is_dir=is_dir)
 
 
+def walk(path, ignore_names=DEFAULT_IGNORE_NAMES, processes=None, chunk_size=1024):
+    """Walks the directory tree and yields files which are not ignored.
+
+    Ignored directories and `.git` are not entered. Symbolic links are not followed.
+
+    If `processes` is set, the tree is split at top-level subdirectories which are walked by a pool of processes. Each
+    process receives rules from ignore files of the parent directories instead of looking for them again. Paths are
+    sent back in chunks as soon as they are found, so the order of paths is not defined.
+
+    Args:
+        path (str | bytes): Root of the directory tree. If it is `bytes`, yielded paths are `bytes` as well.
+        ignore_names (list[str], optional): List of names of ignore files.
+        processes (int, optional): Number of worker processes. The tree is walked in the current process if not set.
+        chunk_size (int, optional): Number of paths sent back by worker processes at once.
+
+    Yields:
+        str | bytes: Path to the file which is not ignored.
+
+    Raises:
+        RuntimeError: If a worker process terminates abruptly, e.g. it is killed.
+    """
+
+    matches = Cache(ignore_names=ignore_names)
+    if not processes:
+        yield from _walk(matches, [path])
+        return
+
+    subdirectories = []
+    for name, is_dir in _list_directory(path):
+        entry_path = os.path.join(path, name)
+        if not matches(entry_path, is_dir=is_dir):
+            if is_dir:
+                subdirectories.append(entry_path)
+
+            else:
+                yield entry_path
+
+    if subdirectories:
+        import multiprocessing
+
+        import queue as queue_module
+
+        queue = multiprocessing.Queue(maxsize=4 * processes)
+        children = {child.pid for child in multiprocessing.active_children()}
+        with multiprocessing.Pool(processes, initializer=_walk_initializer, initargs=(matches, queue)) as pool:
+            # Workers do not exit while the pool is open, so a missing worker is the one which was killed. Its task
+            # would never send the sentinel, and the pool would never report it.
+            workers = {child.pid for child in multiprocessing.active_children()} - children
+            results = [pool.apply_async(_walk_worker, (subdirectory, chunk_size)) for subdirectory in subdirectories]
+
+            remaining = len(subdirectories)
+            while remaining:
+                try:
+                    chunk = queue.get(timeout=_walk_liveness_interval)
+
+                except queue_module.Empty:
+                    for result in results:
+                        if result.ready():
+                            result.get()  # Raises errors which happened outside of `_walk_worker()`.
+
+                    if not workers <= {child.pid for child in multiprocessing.active_children()}:
+                        raise RuntimeError("Worker process terminated abruptly.")
+
+                    continue
+
+                if chunk is None:
+                    remaining -= 1
+
+                elif isinstance(chunk, BaseException):
+                    raise chunk
+
+                else:
+                    yield from chunk
+
+
+async def awalk(path, ignore_names=DEFAULT_IGNORE_NAMES, executor=None, max_workers=8):
+    """Walks the directory tree asynchronously and yields files which are not ignored.
+
+    Ignored directories and `.git` are not entered. Listing of directories and lookups of ignore files are done in
+    `executor`, so many trees could be walked at the same time without stalling the event loop. Symbolic links are not
+    followed.
+
+    Args:
+        path (str | bytes): Root of the directory tree. If it is `bytes`, yielded paths are `bytes` as well.
+        ignore_names (list[str], optional): List of names of ignore files.
+        executor (concurrent.futures.Executor, optional): Executor for filesystem calls. If not set, a thread pool
+            with `max_workers` threads is used.
+        max_workers (int, optional): Maximum number of concurrent filesystem calls if `executor` is not set.
+
+    Yields:
+        str | bytes: Path to the file which is not ignored.
+    """
+
+    import asyncio
+    import concurrent.futures
+
+    loop = asyncio.get_event_loop()
+    matches = Cache(ignore_names=ignore_names)
+    own_executor = executor is None
+    if own_executor:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+
+    async def list_directory(directory):
+        return directory, await loop.run_in_executor(executor, _list_directory, directory)
+
+    pending = {asyncio.ensure_future(list_directory(path))}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                directory, entries = task.result()
+                for name, is_dir in entries:
+                    entry_path = os.path.join(directory, name)
+                    if not await matches.aignored(entry_path, is_dir=is_dir, executor=executor):
+                        if is_dir:
+                            pending.add(asyncio.ensure_future(list_directory(entry_path)))
+
+                        else:
+                            yield entry_path
+
+    finally:
+        for task in pending:
+            task.cancel()
+
+        if own_executor:
+            executor.shutdown(wait=False)
+
+
 class Cache:
     """Caches information about different `.gitignore` files in the directory tree.
 
     Allows to reduce number of queries to filesystem to mininum.
     """
 
-    def __init__(self, ignore_names=DEFAULT_IGNORE_NAMES):
+    def __init__(self, ignore_names=DEFAULT_IGNORE_NAMES, engine="re", root=None, memo_size=0):
         """Constructs `Cache` objects.
 
+        Ignore files are looked up from the directory of the path up to the root of the repository, like Git does.
+        Ignore files from `.git` directory, like `.git/info/exclude`, are read only in the root of the repository.
+
         Args:
             ignore_names (list[str], optional): List of names of ignore files.
+            engine (str, optional): Matching engine, see `IgnoreSpec.from_lines()`.
+            root (str, optional): Root of the repository. Paths outside of it are never ignored. By default, the
+                first parent directory which contains `.git` is the root.
+            memo_size (int, optional): Maximum number of results to remember, so repeated queries for the same paths
+                are not matched again. Disabled by default.
         """
 
         self.__ignore_names = ignore_names
-        self.__gitignores = {}
+        self.__engine = engine
+        self.__root = None if root is None else _Path(root).decoded()
+        self.__gitignores = {}  # Rules of each directory, along with their compiled form and matcher.
+        self.__compiled = {}  # Compiled rules, shared by directories with the same rules.
+        self.__contents = {}  # Rules of ignore files which are used instead of reading them, see `impact()`.
+        self.__memo_size = memo_size
+        self.__verdicts = {}  # Results for each directory, by name and `is_dir` (`None` if it does not matter).
+        self.__verdicts_count = 0
+        self.__lock = threading.Lock()
+
+    def __getstate__(self):
+        """Returns state of the object for `pickle`.
+
+        Returns:
+            dict: Rules found so far, without compiled matchers and the lock.
+        """
+
+        state = self.__dict__.copy()
+        del state["_Cache__lock"]
+        state["_Cache__gitignores"] = {directory: known[0] for directory, known in self.__gitignores.items()}
+        state["_Cache__compiled"] = {}
+        return state
+
+    def __setstate__(self, state):
+        """Restores state of the object from `pickle`.
+
+        Args:
+            state (dict): State returned by `__getstate__()`.
+        """
+
+        self.__dict__.update(state)
+        self.__gitignores = {
+            directory: self.__compile(rules, None, _Path(directory)) for directory, rules in self.__gitignores.items()
+        }
+        self.__lock = threading.Lock()
 
     def __call__(self, path, is_dir=None):
         """Checks whether the specified path is ignored.
 
+        Paths could be `bytes`, e.g. from `os.scandir(b"...")`, then they are matched without decoding.
+
+        Args:
+            path (str | bytes | os.PathLike): Path to check against ignore rules.
+            is_dir (bool | Callable[[], bool] | os.DirEntry, optional): Set if you know whether the specified path is
+                a directory, or how to find it out. It's checked only if some directory-only rule matches the path.
+        """
+
+        path = _Path(path, is_dir)
+        return self.__match(path, self.__matcher(path))
+
+    async def aignored(self, path, is_dir=None, executor=None):
+        """Checks whether the specified path is ignored without blocking the event loop.
+
+        Lookups of ignore files and `isdir()` calls are done in `executor`, matching itself is done in the event loop.
+
+        Args:
+            path (str | bytes | os.PathLike): Path to check against ignore rules.
+            is_dir (bool | Callable[[], bool] | os.DirEntry, optional): Set if you know whether the specified path is
+                a directory, or how to find it out. It's checked only if some directory-only rule matches the path.
+            executor (concurrent.futures.Executor, optional): Executor for filesystem calls. Default executor of the
+                event loop is used if not set.
+
+        Returns:
+            bool: `True` if the path is ignored.
+        """
+
+        import asyncio
+
+        path = _Path(path, is_dir if is_dir is not None else _raise_is_dir_required)
+        loop = asyncio.get_event_loop()
+        known = self.__gitignores.get(path.parts[:-1])
+        if known is not None:
+            matcher = known[2]
+
+        else:
+            matcher = await loop.run_in_executor(executor, self.__matcher, path)
+
+        try:
+            return self.__match(path, matcher)
+
+        except _IsDirRequired:
+            path = _Path(path.parts, await loop.run_in_executor(executor, os.path.isdir, os.fspath(path)))
+            return self.__match(path, matcher)
+
+    def invalidate(self, path=None):
+        """Forgets ignore files of the directory and all its subdirectories, along with remembered results.
+
+        Call it when ignore files are changed, added or removed.
+
+        Args:
+            path (str | bytes | os.PathLike, optional): Directory which ignore files are changed. Everything is
+                forgotten if not set.
+        """
+
+        with self.__lock:
+            if path is None:
+                self.__gitignores.clear()
+                self.__verdicts.clear()
+                self.__verdicts_count = 0
+
+            else:
+                path = _Path(path)
+                prefixes = {path.decoded().parts, path.encoded().parts}
+                length = len(path.parts)
+                for directory in [d for d in list(self.__gitignores) if d[:length] in prefixes]:
+                    self.__gitignores.pop(directory, None)
+
+                for directory in [d for d in list(self.__verdicts) if d[:length] in prefixes]:
+                    self.__verdicts_count -= len(self.__verdicts.pop(directory, ()))
+
+    def impact(self, path, old, new, paths):
+        """Finds paths which become ignored or not ignored when the ignore file changes.
+
+        Only paths inside the directory of the ignore file which match added, removed or reordered rules are checked
+        against both versions of the rules. Other ignore files are read as usual.
+
         Args:
-            path (str): Path to check against ignore rules.
-            is_dir (bool, optional): Set if you know whether the specified path is a directory.
+            path (str | bytes | os.PathLike): Path to the ignore file, its name should be one of `ignore_names`.
+            old (Iterable[str | bytes]): Old lines of the ignore file.
+            new (Iterable[str | bytes]): New lines of the ignore file.
+            paths (Iterable[str | bytes | os.PathLike]): Paths to check.
+
+        Returns:
+            list: Paths which change their status, in the same order.
+
+        Raises:
+            ValueError: If the name of the file is not one of `ignore_names`.
         """
 
-        path = _Path(path)
-        add_to_children = {}
-        plain_paths = []
+        ignore_path = _Path(path).decoded()
+        base_path = _ignore_file_directory(ignore_path, self.__ignore_names)
+        if base_path is None:
+            raise ValueError(f"Not an ignore file: {path!r}")
+
+        old = tuple(rule.state for rule in _rules_from_lines(old))
+        new = tuple(rule.state for rule in _rules_from_lines(new))
+        start = 0
+        while start < min(len(old), len(new)) and old[start] == new[start]:
+            start += 1
+
+        end = 0
+        while end < min(len(old), len(new)) - start and old[-end - 1] == new[-end - 1]:
+            end += 1
+
+        # If no changed rule matches the path, the last matching rule of the file stays the same.
+        changed = old[start : len(old) - end] + new[start : len(new) - end]
+        if not changed:
+            return []
+
+        changed = IgnoreSpec(
+            [_IgnoreRule(pattern, anchored, False, directory_only) for pattern, anchored, _, directory_only in changed],
+            base_path,
+            engine=self.__engine,
+        )
+        versions = []
+        for rules in (old, new):
+            version = Cache(ignore_names=self.__ignore_names, engine=self.__engine, root=self.__root)
+            version.__gitignores = {
+                directory: known
+                for directory, known in self.__gitignores.items()
+                if _Path(directory).decoded().relpath(base_path) is None
+            }
+            version.__compiled = self.__compiled
+            version.__contents = {ignore_path.parts: rules}
+            versions.append(version)
+
+        impact = []
+        for original_path in paths:
+            path = _Path(original_path)
+            if changed.match(path):
+                old_verdict, new_verdict = (version.__match(path, version.__matcher(path)) for version in versions)
+                if old_verdict != new_verdict:
+                    impact.append(original_path)
+
+        return impact
+
+    def __match(self, path, matcher):
+        if matcher is None:
+            return False
+
+        if not self.__memo_size:
+            return matcher.match(path)
+
+        directory, name = path.parts[:-1], path.parts[-1]
+        verdicts = self.__verdicts.get(directory)
+        if verdicts is not None:
+            verdict = verdicts.get((name, None))
+            if verdict is not None:
+                return verdict
+
+            if (name, False) in verdicts or (name, True) in verdicts:  # Result depends on `is_dir`.
+                verdict = verdicts.get((name, path.isdir()))
+                if verdict is not None:
+                    return verdict
+
+        is_dir_used = []
+
+        def is_dir():
+            is_dir_used.append(True)
+            return path.isdir()
+
+        verdict = matcher.match(_Path(path.parts, is_dir))
+        if self.__verdicts_count >= self.__memo_size:
+            self.__verdicts.clear()
+            self.__verdicts_count = 0
+
+        self.__verdicts.setdefault(directory, {})[(name, path.isdir() if is_dir_used else None)] = verdict
+        self.__verdicts_count += 1
+        return verdict
+
+    def __matcher(self, path):
+        known = self.__gitignores.get(path.parts[:-1])
+        if known is None:
+            with self.__lock:
+                known = self.__discover(path)
+
+        return known[2]
+
+    def __discover(self, path):
+        # Collects unknown directories from the parent of the path up to the root of the repository.
+        #
+        # Each directory gets single matcher. Rules of its parent directory are rebased onto it, and its own rules
+        # follow them, so the last matching rule wins like in Git: deeper ignore files override upper ones, and files
+        # listed earlier in `ignore_names` override later ones, like `.gitignore` overrides `.git/info/exclude`.
+        # Like Git, ignore files inside ignored directories are not read.
+        directories = []
+        rules, compiled = (), None
         for parent in path.parents():
-            if parent.parts in self.__gitignores:
+            known = self.__gitignores.get(parent.parts)
+            if known is not None:
+                rules, compiled, _ = known
+                break
+
+            is_root = self.__is_root(parent)
+            directories.append((parent, is_root))
+            if is_root:
                 break
 
-            ignore_paths = []
-            for ignore_name in self.__ignore_names:
-                ignore_path = parent.join(ignore_name)
-                if ignore_path.isfile():
-                    ignore_paths.append(str(ignore_path))
+        else:
+            if self.__root is not None:  # The path is outside of the root.
+                directories = []
+                self.__gitignores[path.parts[:-1]] = ((), None, None)
+
+        for directory, is_root in reversed(directories):
+            ignored = compiled is not None and compiled.match(directory.parts[-1], lambda: True)
+            if ignored:
+                rules, compiled = _everything_rules, None
+
+            elif compiled is not None:
+                rebased = compiled.rebase(directory.parts[-1])
+                if rebased is not None:
+                    rules, compiled = rebased, None
+
+            for ignore_name in reversed(self.__ignore_names):
+                if ignored:
+                    break
+
+                if is_root or not ignore_name.startswith(".git/"):  # Only root directory of repository has `.git`.
+                    ignore_path = directory.join(ignore_name)
+                    if self.__contents and _Path(os.fspath(ignore_path)).decoded().parts in self.__contents:
+                        own_rules = self.__contents[_Path(os.fspath(ignore_path)).decoded().parts]
+
+                    elif ignore_path.isfile():
+                        with open(os.fspath(ignore_path), "rb") as ignore_file:
+                            own_rules = tuple(rule.state for rule in _rules_from_lines(ignore_file))
+
+                    else:
+                        own_rules = ()
+
+                    if own_rules:
+                        rules += own_rules
+                        compiled = None
+
+            self.__gitignores[directory.parts] = self.__compile(rules, compiled, directory)
+            compiled = self.__gitignores[directory.parts][1]
+
+        return self.__gitignores[path.parts[:-1]]
+
+    def __compile(self, rules, compiled, directory):
+        # Returns rules of the directory along with their compiled form, which is shared with other directories, and
+        # matcher.
+        if not rules:
+            return rules, None, None
+
+        if compiled is None:
+            compiled = self.__compiled.get(rules)
+            if compiled is None:
+                if len(self.__compiled) >= _max_compiled_rules:
+                    self.__compiled.clear()
+
+                compiled = _IgnoreRules([_IgnoreRule(*rule) for rule in rules], self.__engine)
+                self.__compiled[rules] = compiled
+
+        return rules, compiled, IgnoreSpec(compiled, directory, engine=self.__engine)
+
+    def __is_root(self, directory):
+        if self.__root is not None:
+            return directory.decoded().parts == self.__root.parts
+
+        else:
+            return os.path.exists(os.fspath(directory.join(".git")))
+
+
+class Scanner:
+    """Incrementally scans the directory tree for files which are not ignored.
+
+    Like untracked cache of Git, it remembers modification times of each directory and of its ignore files, along with
+    entries which are not ignored. On the next scan, directories which did not change are not listed and their entries
+    are not matched again. If ignore files of a directory change, the directory and all its subdirectories are scanned
+    from scratch. Like in Git, `.git` is not scanned, so commands which change it do not make scans slower.
+    """
+
+    def __init__(self, path, ignore_names=DEFAULT_IGNORE_NAMES, engine="re"):
+        """Constructs `Scanner` objects.
+
+        Args:
+            path (str | bytes): Root of the directory tree. If it is `bytes`, paths are `bytes` as well.
+            ignore_names (list[str], optional): List of names of ignore files.
+            engine (str, optional): Matching engine, see `IgnoreSpec.from_lines()`.
+        """
+
+        self.__path = path
+        self.__ignore_names = ignore_names
+        self.__cache = Cache(ignore_names=ignore_names, engine=engine)
+        self.__outer = None  # Ignore files of the parent directories.
+        self.__directories = {}  # Modification times, ignore files and not ignored entries of each directory.
+
+    @property
+    def cache(self):
+        """Cache: Rules used for scanning."""
+
+        return self.__cache
+
+    def scan(self):
+        """Scans the directory tree and yields files which are not ignored.
+
+        Ignored directories are not entered. Symbolic links are not followed. Remembered state is updated when all the
+        files are yielded.
+
+        Yields:
+            str | bytes: Path to the file which is not ignored.
+        """
+
+        outer = tuple(self.__stat_ignore_files(parent) for parent in _Path(self.__path).parents())
+        changed = outer != self.__outer
+        if changed:
+            self.__cache.invalidate()
+
+        directories = {}
+        stack = [(self.__path, changed)]
+        while stack:
+            directory, changed = stack.pop()
+            try:
+                stat = os.stat(directory)
+
+            except OSError:
+                continue
+
+            ignore_files = self.__stat_ignore_files(_Path(directory))
+            known = self.__directories.get(directory)
+            if not changed and (known is None or known[1] != ignore_files):
+                # Rules of subdirectories are forgotten along with the directory, so it is done once for the subtree.
+                changed = True
+                self.__cache.invalidate(directory)
+
+            if changed or known[0] != stat.st_mtime_ns:
+                files, subdirectories = [], []
+                for name, is_dir in _list_directory(directory):
+                    entry_path = os.path.join(directory, name)
+                    if not self.__cache(entry_path, is_dir=is_dir):
+                        (subdirectories if is_dir else files).append(entry_path)
+
+                # Changes made in the same tick as the directory was listed would not change its modification time.
+                mtime = stat.st_mtime_ns if stat.st_mtime < time.time() - _racy_interval else None
+                known = (mtime, ignore_files, files, subdirectories)
+
+            directories[directory] = known
+            yield from known[2]
+            stack.extend((subdirectory, changed) for subdirectory in reversed(known[3]))
+
+        self.__outer = outer
+        self.__directories = directories
+
+    def __stat_ignore_files(self, directory):
+        return tuple(_stat(os.fspath(directory.join(ignore_name))) for ignore_name in self.__ignore_names)
+
+
+class Snapshot:
+    """Results of scanning the directory tree, stored in a file and mapped into memory.
+
+    Snapshots answer whether paths are ignored and list files which are not ignored without reading ignore files and
+    walking the tree, so they could be written once and shared by many processes. The file holds sorted table of
+    scanned directories and sorted names of entries of each directory marked as ignored or not, so lookups are binary
+    searches right in the mapped file.
+    """
+
+    def __init__(self, path):
+        """Opens snapshot written with `write()`.
+
+        Args:
+            path (str | bytes): Path to the snapshot file.
+
+        Raises:
+            ValueError: If the file is not a snapshot.
+        """
+
+        import mmap
+
+        with open(path, "rb") as f:
+            self.__data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            magic, version, self.__directories, self.__entries, root, root_size = _snapshot_header.unpack_from(
+                self.__data
+            )
+
+        except struct.error:
+            magic, version = None, None
+
+        if magic != _snapshot_magic or version != _snapshot_version:
+            self.__data.close()
+            raise ValueError(f"Not a snapshot: {path!r}")
+
+        self.__root = _Path(self.__data[root : root + root_size])
+
+    @staticmethod
+    def write(path, root, cache=None):
+        """Scans the directory tree and writes its snapshot.
+
+        Snapshot is written to temporary file which then replaces the file, so processes which have opened the old
+        snapshot could continue using it. Like in Git, `.git` is not recorded.
+
+        Args:
+            path (str | bytes): Path to the snapshot file.
+            root (str | bytes): Root of the directory tree.
+            cache (Cache, optional): Rules for scanning. New `Cache` is used if not set.
+        """
+
+        import tempfile
+
+        if cache is None:
+            cache = Cache()
+
+        root = os.path.abspath(root)
+        directories = []
+        stack = [(root, b"")]
+        while stack:
+            directory, rel_path = stack.pop()
+            entries = []
+            for name, is_dir in _list_directory(directory):
+                entry_path = os.path.join(directory, name)
+                ignored = cache(entry_path, is_dir=is_dir)
+                name = os.fsencode(name)
+                entries.append((name, is_dir, ignored))
+                if is_dir and not ignored:
+                    stack.append((entry_path, rel_path + b"/" + name if rel_path else name))
+
+            directories.append((rel_path, sorted(entries)))
+
+        directories.sort()
+        root = os.fsencode(root)
+        count = sum(len(entries) for _, entries in directories)
+        entries_offset = _snapshot_header.size + _snapshot_directory.size * len(directories)
+        strings_offset = entries_offset + _snapshot_entry.size * count
+        chunks = [
+            _snapshot_header.pack(
+                _snapshot_magic, _snapshot_version, len(directories), entries_offset, strings_offset, len(root)
+            )
+        ]
+        strings = [root]
+        offset = strings_offset + len(root)
+        index = 0
+        for rel_path, entries in directories:
+            chunks.append(_snapshot_directory.pack(offset, len(rel_path), index, len(entries)))
+            strings.append(rel_path)
+            offset += len(rel_path)
+            index += len(entries)
+
+        for _, entries in directories:
+            for name, is_dir, ignored in entries:
+                flags = (_snapshot_directory_flag if is_dir else 0) | (_snapshot_ignored_flag if ignored else 0)
+                chunks.append(_snapshot_entry.pack(offset, len(name), flags))
+                strings.append(name)
+                offset += len(name)
+
+        fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.writelines(chunks)
+                f.writelines(strings)
+
+            os.replace(temporary_path, path)
+
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+    def close(self):
+        """Unmaps the snapshot file."""
+
+        self.__data.close()
+
+    def __enter__(self):
+        """Enters context manager.
+
+        Returns:
+            Snapshot: The object itself.
+        """
+
+        return self
+
+    def __exit__(self, *args):
+        """Exits context manager and unmaps the snapshot file.
+
+        Args:
+            *args: Exception details, if any.
+        """
+
+        self.close()
+
+    def ignored(self, path):
+        """Checks whether the specified path is ignored.
+
+        Args:
+            path (str | bytes | os.PathLike): Path to check.
+
+        Returns:
+            bool: `True` if the path is ignored.
+
+        Raises:
+            KeyError: If the path was not found when the snapshot was written.
+        """
+
+        rel_path = _Path(path).encoded().relpath(self.__root)
+        if rel_path is None:
+            raise KeyError(path)
+
+        if not rel_path:
+            return False
+
+        parent, _, name = rel_path.rpartition(b"/")
+        flags = self.__find(parent, name)
+        if flags is None:  # Parent directory was not scanned, so it's ignored or it does not exist.
+            parent = b""
+            for name in rel_path.split(b"/"):
+                flags = self.__find(parent, name)
+                if flags is None:
+                    raise KeyError(path)
+
+                if flags & _snapshot_ignored_flag:
+                    break
+
+                parent = parent + b"/" + name if parent else name
+
+        return bool(flags & _snapshot_ignored_flag)
+
+    def files(self, path=None):
+        """Yields files which are not ignored inside the directory.
+
+        Args:
+            path (str | bytes | os.PathLike, optional): Directory inside the tree. The whole tree if not set.
+
+        Yields:
+            str | bytes: Path to the file which is not ignored. It is `bytes` if `path` is `bytes`.
+        """
+
+        rel_path = b"" if path is None else _Path(path).encoded().relpath(self.__root)
+        if rel_path is None:
+            return
+
+        if rel_path:
+            # Subdirectories follow each other, since slash is followed by zero.
+            indices = list(range(self.__bisect_directory(rel_path + b"/"), self.__bisect_directory(rel_path + b"0")))
+            index = self.__bisect_directory(rel_path)
+            if index < self.__directories and self.__directory(index)[0] == rel_path:
+                indices.insert(0, index)
+
+        else:
+            indices = range(self.__directories)
+
+        root = os.fspath(self.__root)
+        for index in indices:
+            directory, first, count = self.__directory(index)
+            parts = directory.split(b"/") if directory else ()
+            for offset, size, flags in self.__iter_entries(first, count):
+                if not flags:
+                    entry_path = os.path.join(root, *parts, self.__data[offset : offset + size])
+                    yield entry_path if isinstance(path, bytes) else os.fsdecode(entry_path)
+
+    def __directory(self, index):
+        offset, size, first, count = _snapshot_directory.unpack_from(
+            self.__data, _snapshot_header.size + index * _snapshot_directory.size
+        )
+        return self.__data[offset : offset + size], first, count
+
+    def __bisect_directory(self, rel_path):
+        return _snapshot_bisect(self.__data, _snapshot_header.size, self.__directories, _snapshot_directory, rel_path)
+
+    def __iter_entries(self, first, count):
+        for index in range(first, first + count):
+            yield _snapshot_entry.unpack_from(self.__data, self.__entries + index * _snapshot_entry.size)
+
+    def __find(self, rel_path, name):
+        # Returns flags of the entry of the directory, or `None` if there is no such entry or directory.
+        index = self.__bisect_directory(rel_path)
+        if index >= self.__directories:
+            return None
+
+        directory, first, count = self.__directory(index)
+        if directory != rel_path:
+            return None
+
+        entries = self.__entries + first * _snapshot_entry.size
+        index = _snapshot_bisect(self.__data, entries, count, _snapshot_entry, name)
+        if index < count:
+            offset, size, flags = _snapshot_entry.unpack_from(self.__data, entries + index * _snapshot_entry.size)
+            if self.__data[offset : offset + size] == name:
+                return flags
+
+        return None
+
+
+class EventFilter:
+    """Filters batches of filesystem events, e.g. from file watchers, dropping events of ignored paths.
+
+    Events could be paths, tuples `(path, is_dir)` or objects with `src_path`, `is_directory` and optional `dest_path`
+    attributes, like events of `watchdog`. Whether the path is a directory is taken from the event, so no `stat()` is
+    done for it. Results for parent directories are remembered, so events inside ignored directories are dropped with
+    single lookup. Events of ignore files invalidate the rules before the batch is matched.
+    """
+
+    def __init__(self, ignore_names=DEFAULT_IGNORE_NAMES, engine="re", root=None):
+        """Constructs `EventFilter` objects.
+
+        Args:
+            ignore_names (list[str], optional): List of names of ignore files.
+            engine (str, optional): Matching engine, see `IgnoreSpec.from_lines()`.
+            root (str, optional): Root of the repository, see `Cache`.
+        """
+
+        self.__ignore_names = ignore_names
+        self.__ignore_file_names = {ignore_name.split("/")[-1] for ignore_name in ignore_names}
+        self.__ignore_file_names.update([os.fsencode(name) for name in self.__ignore_file_names])
+        self.__cache = Cache(ignore_names=ignore_names, engine=engine, root=root)
+        self.__directories = {}  # Whether each directory is ignored.
+
+    @property
+    def cache(self):
+        """Cache: Rules used for filtering."""
+
+        return self.__cache
+
+    def filter(self, events):
+        """Drops events of ignored paths.
+
+        Args:
+            events (Iterable[str | bytes | os.PathLike | tuple | object]): Batch of events.
+
+        Returns:
+            list[str | bytes]: Paths which are not ignored, each one once, in order of their first events.
+        """
+
+        paths = {}  # Whether each path is a directory, `None` if unknown.
+        order = []
+        for event in events:
+            event_paths = _event_paths(event)
+            for path, is_dir in event_paths:
+                if path not in paths:
+                    order.append(path)
+                    paths[path] = is_dir
+
+                elif paths[path] is None:
+                    paths[path] = is_dir
+
+                if os.path.basename(path) in self.__ignore_file_names:
+                    self.__invalidate(_ignore_file_directory(_Path(path), self.__ignore_names))
+
+                elif is_dir and len(event_paths) > 1:
+                    self.__invalidate(path)  # Moved directory could bring its ignore files.
+
+        return [path for path in order if not self.__ignored(path, paths[path])]
+
+    def __ignored(self, path, is_dir):
+        directory = os.path.dirname(path)
+        ignored = self.__directories.get(directory)
+        if ignored is None:
+            unknown = []
+            while ignored is None:
+                parent = os.path.dirname(directory)
+                if parent == directory:  # Root of the filesystem.
+                    ignored = False
+
+                else:
+                    unknown.append(directory)
+                    directory = parent
+                    ignored = self.__directories.get(directory)
+
+            if len(self.__directories) + len(unknown) > _max_cached_components:
+                self.__directories.clear()
+
+            for directory in reversed(unknown):
+                # Like in Git, everything inside ignored directory is ignored.
+                ignored = ignored or self.__cache(directory, is_dir=True)
+                self.__directories[directory] = ignored
+
+        return ignored or self.__cache(path, is_dir=is_dir)
+
+    def __invalidate(self, directory):
+        if directory is not None:
+            self.__cache.invalidate(directory)
+            self.__directories.clear()
+
+
+class IgnoreSpec:
+    """Compiled rules of single ignore file.
+
+    Objects could be pickled, marshalled with `dumps()` and `loads()`, hashed and compared. Serialized form keeps
+    already parsed rules, and regular expressions are compiled on first use, so loading is cheap.
+    """
+
+    def __init__(self, rules, base_path, engine="re"):
+        """Constructs `IgnoreSpec` objects. Use `from_lines()` or `from_file()` instead.
+
+        Args:
+            rules (list): Compiled rules.
+            base_path (str): Base path for applying ignore rules.
+            engine (str, optional): Matching engine, see `from_lines()`.
+        """
+
+        self.__rules = rules if isinstance(rules, _IgnoreRules) else _IgnoreRules(rules, engine)
+        self.__base_path = (base_path if isinstance(base_path, _Path) else _Path(base_path)).decoded()
+        self.__base_path_bytes = None
+
+    @classmethod
+    def from_lines(cls, lines, base_path, engine="re"):
+        """Compiles ignore rules.
+
+        Args:
+            lines (Iterable[str | bytes]): Lines of ignore file. Bytes are decoded as UTF-8, and invalid bytes are kept
+                as surrogates with `surrogateescape` error handler, so they match the same bytes of `bytes` paths.
+            base_path (str): Base path for applying ignore rules.
+            engine (str, optional): Matching engine. `"re"` matches each rule with its regular expression, `"dfa"`
+                matches all the rules at once with lazily built automaton, which takes linear time on any patterns.
+
+        Returns:
+            IgnoreSpec: Compiled rules.
+        """
+
+        return cls(_rules_from_lines(lines), base_path, engine=engine)
+
+    @classmethod
+    def from_file(cls, path, base_path=None, engine="re"):
+        """Compiles rules of ignore file.
+
+        Lines are decoded as UTF-8, see `from_lines()`.
+
+        Args:
+            path (str): Path to `.gitignore` file.
+            base_path (str, optional): Base path for applying ignore rules. Directory of the file by default.
+            engine (str, optional): Matching engine, see `from_lines()`.
+
+        Returns:
+            IgnoreSpec: Compiled rules.
+        """
+
+        if base_path is None:
+            base_path = os.path.dirname(path) or os.path.dirname(os.path.abspath(path))
+
+        with open(path, "rb") as ignore_file:
+            return cls.from_lines(ignore_file, base_path, engine=engine)
+
+    @classmethod
+    def loads(cls, data):
+        """Loads rules serialized with `dumps()`.
+
+        Args:
+            data (bytes): Serialized rules.
+
+        Returns:
+            IgnoreSpec: Compiled rules.
+        """
+
+        spec = cls.__new__(cls)
+        spec.__setstate__(marshal.loads(data))
+        return spec
+
+    def dumps(self):
+        """Serializes rules with `marshal`.
+
+        Returns:
+            bytes: Serialized rules.
+        """
+
+        return marshal.dumps(self.__getstate__())
+
+    def __getstate__(self):
+        """Returns state of the object for `pickle`.
+
+        Returns:
+            tuple: Base path, parsed rules and matching engine.
+        """
+
+        return str(self.__base_path), self.__rules.state, self.__rules.engine
+
+    def __setstate__(self, state):
+        """Restores state of the object from `pickle`.
+
+        Args:
+            state (tuple): State returned by `__getstate__()`.
+        """
+
+        base_path, rules, engine = state
+        self.__rules = _IgnoreRules([_IgnoreRule(*rule) for rule in rules], engine)
+        self.__base_path = _Path(base_path)
+        self.__base_path_bytes = None
+
+    def __eq__(self, other):
+        """Compares rules.
+
+        Args:
+            other (IgnoreSpec): Other rules.
+
+        Returns:
+            bool: `True` if base paths and rules are equal.
+        """
+
+        if not isinstance(other, IgnoreSpec):
+            return NotImplemented
+
+        return self.__getstate__() == other.__getstate__()
+
+    def __hash__(self):
+        """Hashes rules.
+
+        Returns:
+            int: Hash of base path and rules.
+        """
+
+        return hash(self.__getstate__())
+
+    def __call__(self, path, is_dir=None):
+        """Checks whether the specified path is ignored.
+
+        Args:
+            path (str | bytes | os.PathLike): Path to check against ignore rules.
+            is_dir (bool | Callable[[], bool] | os.DirEntry, optional): Set if you know whether the specified path is
+                a directory, or how to find it out.
+
+        Returns:
+            bool: `True` if the path is ignored.
+        """
+
+        return self.match(path, is_dir=is_dir)
+
+    def match(self, path, is_dir=None):
+        """Checks whether the specified path is ignored.
+
+        Args:
+            path (str | bytes | os.PathLike): Path to check against ignore rules. `bytes` are matched without decoding.
+            is_dir (bool | Callable[[], bool] | os.DirEntry, optional): Set if you know whether the specified path is
+                a directory, or how to find it out. It's checked only if some directory-only rule matches the path.
+
+        Returns:
+            bool: `True` if the path is ignored.
+        """
+
+        if not isinstance(path, _Path):
+            path = _Path(path, is_dir)
+
+        if path.is_bytes:
+            if self.__base_path_bytes is None:
+                self.__base_path_bytes = self.__base_path.encoded()
+
+            rel_path = path.relpath(self.__base_path_bytes)
+
+        else:
+            rel_path = path.relpath(self.__base_path)
+
+        if rel_path is not None:
+            return self.__rules.match(rel_path, path.isdir)
+
+        else:
+            return False
+
+    def match_many(self, paths, is_dir=None):
+        """Checks which of the specified paths are ignored.
+
+        Args:
+            paths (Iterable[str]): Paths to check against ignore rules.
+            is_dir (bool | Callable[[], bool], optional): Set if you know whether all the specified paths are
+                directories.
+
+        Returns:
+            list[bool]: `True` for every path which is ignored.
+        """
+
+        match = self.match
+        return [match(path, is_dir=is_dir) for path in paths]
+
+    def match_array(self, rel_paths, is_dir=None):
+        """Checks which of the specified paths relative to the base path are ignored, e.g. paths from manifests.
+
+        Paths are split into directories and names, which are dictionary-encoded: each directory is matched once, and
+        each name is matched once for all the directories with the same rules. NumPy and Arrow arrays are accepted if
+        NumPy is installed.
+
+        Args:
+            rel_paths (Sequence[str | bytes] | numpy.ndarray | pyarrow.Array): Paths relative to the base path,
+                separated with `/`.
+            is_dir (Sequence[bool] | numpy.ndarray, optional): Mask of directories. All the paths are files if not set.
+
+        Returns:
+            list[bool] | numpy.ndarray: `True` for every path which is ignored. NumPy array for NumPy and Arrow arrays.
+        """
+
+        try:
+            import numpy
+
+        except ImportError:  # NumPy is optional.
+            numpy = None
+
+        as_array = numpy is not None and hasattr(rel_paths, "__array__")
+        if as_array:
+            # Splitting and dictionary-encoding `numpy.str_` arrays is slower in NumPy than with dictionaries.
+            rel_paths = numpy.asarray(rel_paths).tolist()
+            is_dir = None if is_dir is None else numpy.asarray(is_dir, bool).tolist()
+
+        elif hasattr(rel_paths, "to_pylist"):  # Arrow array without NumPy.
+            rel_paths = rel_paths.to_pylist()
+
+        else:
+            rel_paths = list(rel_paths)
+
+        separator = b"/" if rel_paths and isinstance(rel_paths[0], bytes) else "/"
+        directories = {"": (False, self.__rules), b"": (False, self.__rules)}
+        compiled = {}  # Rules of directories, shared by directories with the same rules.
+        names = {}  # Results for names, by rules of their directories and `is_dir`.
+        entries = {}  # Results for names of each directory by `is_dir` along with its rules, or result for all of them.
+
+        result = []
+        for rel_path, path_is_dir in zip(rel_paths, itertools.repeat(False) if is_dir is None else is_dir):
+            directory, _, name = rel_path.rpartition(separator)
+            known = entries.get(directory)
+            if known is None:
+                ignored, rules = self.__directory(directory, directories, compiled)
+                if ignored or rules is None:
+                    known = ignored
+
+                else:
+                    known = (names.setdefault((rules, False), {}), names.setdefault((rules, True), {}), rules)
+
+                entries[directory] = known
+
+            if known is True or known is False:
+                result.append(known)
+                continue
+
+            path_is_dir = bool(path_is_dir)
+            verdicts = known[path_is_dir]
+            verdict = verdicts.get(name)
+            if verdict is None:
+                verdict = verdicts[name] = bool(known[2].match(name, lambda: path_is_dir))
+
+            result.append(verdict)
+
+        return numpy.array(result, bool) if as_array else result
+
+    def __directory(self, directory, directories, compiled):
+        # Returns whether the directory relative to the base path is ignored, along with rules for its entries, which are
+        # rebased onto it.
+        known = directories.get(directory)
+        if known is None:
+            parent, _, name = directory.rpartition(b"/" if isinstance(directory, bytes) else "/")
+            ignored, rules = self.__directory(parent, directories, compiled)
+            if ignored or rules is None:
+                known = ignored, rules
+
+            elif rules.match(name, lambda: True):
+                known = True, None  # Like in Git, everything inside ignored directory is ignored.
+
+            else:
+                state = rules.rebase(name)
+                if state is not None:
+                    if state not in compiled:
+                        compiled[state] = (
+                            _IgnoreRules([_IgnoreRule(*rule) for rule in state], rules.engine) if state else None
+                        )
+
+                    rules = compiled[state]
+
+                known = False, rules
 
-            if ignore_paths:
-                matches = [parse(ignore_path, base_path=parent) for ignore_path in ignore_paths]
-                add_to_children[parent] = (matches, plain_paths)
-                plain_paths = []
+            directories[directory] = known
 
-            else:
-                plain_paths.append(parent)
+        return known
 
-        else:
-            parent = _Path(tuple())  # Null path.
-            self.__gitignores[parent.parts] = []
-
-        for plain_path in plain_paths:
-            # assert plain_path.parts not in self.__gitignores
-            self.__gitignores[plain_path.parts] = self.__gitignores[parent.parts]
-
-        for parent, (_, parent_plain_paths) in reversed(list(add_to_children.items())):
-            # assert parent.parts not in self.__gitignores
-            self.__gitignores[parent.parts] = self.__gitignores[parent.parts[:-1]].copy()
-            for parent_to_add, (gitignores_to_add, _) in reversed(list(add_to_children.items())):
-                self.__gitignores[parent.parts].extend(gitignores_to_add)
-                if parent_to_add == parent:
-                    break
 
-            self.__gitignores[parent.parts].reverse()
+class _Path:
+    def __init__(self, path, is_dir=None):
+        # `is_dir` could be `bool`, callable or `os.DirEntry`. It's resolved lazily and only once.
+        if not isinstance(path, (str, bytes, tuple)):
+            if is_dir is None and isinstance(path, os.DirEntry):
+                is_dir = path
 
-            for plain_path in parent_plain_paths:
-                # assert plain_path.parts not in self.__gitignores
-                self.__gitignores[plain_path.parts] = self.__gitignores[parent.parts]
+            path = os.fspath(path)
 
-        # This parent comes either from first or second loop.
-        return any((m(path, is_dir=is_dir) for m in self.__gitignores[parent.parts]))
+        if isinstance(is_dir, os.DirEntry):
+            is_dir = is_dir.is_dir
 
+        if isinstance(path, tuple):
+            self.__parts = path
+            self.__joined = None
+            self.__is_dir = is_dir
+            self.__is_bytes = bool(path) and isinstance(path[0], bytes)
 
-class _Path:
-    def __init__(self, path):
-        if isinstance(path, str):
+        else:
             abs_path = os.path.abspath(path)
             self.__parts = tuple(_path_split(abs_path))
             self.__joined = abs_path
-            self.__is_dir = None
-
-        else:
-            self.__parts = path
-            self.__joined = None
-            self.__is_dir = None
+            self.__is_dir = is_dir
+            self.__is_bytes = isinstance(path, bytes)
 
     @property
     def parts(self):
         return self.__parts
 
+    @property
+    def is_bytes(self):
+        return self.__is_bytes
+
+    def decoded(self):
+        return _Path(tuple(os.fsdecode(part) for part in self.__parts)) if self.__is_bytes else self
+
+    def encoded(self):
+        return self if self.__is_bytes else _Path(tuple(os.fsencode(part) for part in self.__parts))
+
     def join(self, name):
+        if self.__is_bytes and isinstance(name, str):
+            name = os.fsencode(name)
+
         return _Path(self.__parts + (name,))
 
     def relpath(self, base_path):
         if self.__parts[: len(base_path.__parts)] == base_path.__parts:
-            return "/".join(self.__parts[len(base_path.__parts) :])
+            return (b"/" if self.__is_bytes else "/").join(self.__parts[len(base_path.__parts) :])
 
         else:
             return None
@@ -168,19 +1593,43 @@ class _Path:
             yield _Path(self.__parts[:i])
 
     def isfile(self):
-        return os.path.isfile(str(self))
+        return os.path.isfile(self.__fspath__())
 
     def isdir(self):
-        if self.__is_dir is not None:
-            return self.__is_dir
-        self.__is_dir = os.path.isdir(str(self))
+        if self.__is_dir is None:
+            self.__is_dir = os.path.isdir(self.__fspath__())
+
+        elif self.__is_dir is not True and self.__is_dir is not False:
+            self.__is_dir = bool(self.__is_dir())
+
         return self.__is_dir
 
-    def __str__(self):
+    def __fspath__(self):
         if self.__joined is None:
-            self.__joined = os.sep.join(self.__parts) if self.__parts != ("",) else os.sep
+            sep = os.fsencode(os.sep) if self.__is_bytes else os.sep
+            self.__joined = sep.join(self.__parts) if self.__parts != (sep[:0],) else sep
         return self.__joined
 
+    def __str__(self):
+        return os.fsdecode(self.__fspath__())
+
+
+def _rules_from_lines(lines):
+    rules = []
+    for i, line in enumerate(lines):
+        if not isinstance(line, str):
+            line = _decode_pattern(line)
+
+        if i == 0 and line.startswith("\ufeff"):  # Git skips UTF-8 BOM.
+            line = line[1:]
+
+        line = line.rstrip("\r\n")
+        rule = _rule_from_pattern(line)
+        if rule:
+            rules.append(rule)
+
+    return rules
+
 
 def _rule_from_pattern(pattern):
     # Takes a `.gitignore` match pattern, such as "*.py[cod]" or "**/*.bak",
@@ -255,57 +1704,269 @@ def _rule_from_pattern(pattern):
                 pattern = pattern[:i]
         i -= 1
 
-    regexp = _fnmatch_pathname_to_regexp(pattern, anchored, directory_only)
-    return _IgnoreRule(regexp, negation, directory_only)
+    # Redundant wildcards make regular expressions backtrack more, so they are removed
+    pattern = _simplify_pattern(pattern, anchored)
+
+    return _IgnoreRule(pattern, anchored, negation, directory_only)
 
 
 class _IgnoreRules:
-    def __init__(self, rules, base_path):
+    def __init__(self, rules, engine="re"):
+        if engine not in ("re", "dfa"):
+            raise ValueError(f"Unknown engine: {engine!r}")
+
         self.__rules = rules
-        self.__can_return_immediately = not any((r.negation for r in rules))
-        self.__base_path = _Path(base_path) if isinstance(base_path, str) else base_path
+        self.__engine = engine
+        self.__matchers = [None, None]  # For `str` and `bytes` paths.
+        self.__others = None  # Indices of rules which could match more than one component.
 
-    def match(self, path, is_dir=None):
-        if isinstance(path, str):
-            path = _Path(path)
+    @property
+    def state(self):
+        return tuple(rule.state for rule in self.__rules)
+
+    def rebase(self, name):
+        # Returns states of rules which match paths inside subdirectory `name` relative to it, or `None` if they are
+        # the same. The subdirectory should not be ignored, so rules which match the subdirectory itself do not matter
+        # anymore. Unanchored rules without slashes stay the same.
+        others = self.__others
+        if others is None:
+            others = self.__others = {
+                index
+                for index, rule in enumerate(self.__rules)
+                if not rule.state[0] or rule.state[1] or _component_expr(rule.state[0]) is None
+            }
+
+        if not others:
+            return None
 
-        rel_path = path.relpath(self.__base_path)
+        changed = False
+        rebased = []
+        for index, rule in enumerate(self.__rules):
+            state = rule.state
+            if index in others:
+                rules = _rebase_rule(state, name)
+                rebased.extend(rules)
+                changed = changed or rules != (state,)
 
-        if rel_path is not None:
-            if is_dir is None:
-                is_dir = path.isdir()  # TODO Pass callable here.
+            else:
+                rebased.append(state)
 
-            if self.__can_return_immediately:
-                return any((r.match(rel_path, is_dir) for r in self.__rules))
+        return tuple(rebased) if changed else None
 
-            else:
-                matched = False
-                for rule in self.__rules:
-                    if rule.match(rel_path, is_dir):
-                        matched = not rule.negation
+    @property
+    def engine(self):
+        return self.__engine
+
+    def match(self, rel_path, is_dir):
+        encoded = isinstance(rel_path, bytes)
+        matcher = self.__matchers[encoded]
+        if matcher is None:
+            matcher = (_IgnoreAutomaton if self.__engine == "dfa" else _IgnoreIndex)(self.__rules, encoded=encoded)
+            self.__matchers[encoded] = matcher
+
+        return matcher.match(rel_path, is_dir)
+
+
+class _IgnoreIndex:
+    # Matches rules with regular expressions.
+    #
+    # Like in Git, the path is ignored if the last rule which matches it or any of its parent directories is not
+    # a negation. Without negations, the path is ignored if any rule matches it or any of its parent directories.
+    #
+    # Unanchored rules without slashes, like `*.log` or `build`, could match only single component of the path, so
+    # they are matched against components instead of the whole path. Plain names are looked up in dictionary, other
+    # patterns are matched with regular expressions of single component. Results are cached for each component.
+    #
+    # Rules which regular expressions could backtrack for too long on crafted paths, see `_backtracks()`, are matched
+    # with automata in linear time instead.
+
+    def __init__(self, rules, encoded=False):
+        self.__matches = []
+        self.__prefix_matches = []
+        self.__negations = [rule.negation for rule in rules]
+        self.__directory_only = []
+        self.__can_return_immediately = not any(self.__negations)
+        self.__separator = b"/" if encoded else "/"
+        self.__names = {}  # Rule indices for each plain name.
+        self.__patterns = []  # Rule indices along with matching functions for single component.
+        self.__others = []  # Indices of rules matched against the whole path, in reverse order.
+        self.__hits = {}  # Cached rule indices for each component.
+
+        for index, rule in enumerate(rules):
+            pattern, anchored, _, directory_only = rule.state
+            self.__directory_only.append(directory_only)
+            tokens = _fnmatch_pathname_tokens(pattern) if pattern and not anchored else None
+            if tokens and all(map(_is_component_token, tokens)):
+                if all(token[0] == "c" for token in tokens):
+                    name = "".join(token[1] for token in tokens)
+                    self.__names.setdefault(_encode_pattern(name) if encoded else name, []).append(index)
+
+                elif _backtracks(tokens, True):
+                    search = _IgnoreAutomaton([_IgnoreRule(pattern, True, False, False)], encoded=encoded).search
+                    self.__patterns.append((index, lambda name, search=search: search(name)[0]))
 
                 else:
-                    return matched
+                    expr = f"{_fnmatch_tokens_to_regexp(tokens)}$"
+                    self.__patterns.append((index, re.compile(_encode_pattern(expr) if encoded else expr).match))
 
-        else:
-            return False
+            else:
+                self.__others.append(index)
+
+            if rule.backtracks:
+                self.__matches.append(rule.match_linear)
+                self.__prefix_matches.append(rule.match_prefix_linear)
+
+            else:
+                self.__matches.append(rule.match_bytes if encoded else rule.match)
+                self.__prefix_matches.append(rule.match_prefix_bytes if encoded else rule.match_prefix)
+
+        self.__others.reverse()
+        self.__has_components = bool(self.__names or self.__patterns)
+
+    def __component(self, name):
+        hits = self.__hits.get(name)
+        if hits is None:
+            hits = list(self.__names.get(name, ()))
+            hits.extend(index for index, match in self.__patterns if match(name))
+            if len(self.__hits) >= _max_cached_components:
+                self.__hits.clear()
+
+            hits = self.__hits[name] = tuple(sorted(hits))
+
+        return hits
+
+    def match(self, rel_path, is_dir):
+        if self.__can_return_immediately:
+            return self.__match_any(rel_path, is_dir)
+
+        names = rel_path.split(self.__separator)
+        last = len(names) - 1
+        bests = []  # Index of last matching rule for the path and for each of its parent directories.
+        for i, name in enumerate(names):
+            best = -1
+            if self.__has_components:
+                for index in reversed(self.__component(name)):
+                    if i < last or not self.__directory_only[index] or is_dir():
+                        best = index
+                        break
+
+            bests.append(best)
+
+        if self.__others:
+            ends = []
+            end = -1
+            for name in names:
+                end += len(name) + 1
+                ends.append(end)
+
+            lowest = min(bests)
+            for index in self.__others:
+                if index <= lowest:
+                    break
+
+                if not self.__matches[index](rel_path, is_dir):
+                    continue  # Neither the path nor any of its parent directories match.
+
+                match_prefix = self.__prefix_matches[index]
+                for i, end in enumerate(ends):
+                    if (
+                        index > bests[i]
+                        and match_prefix(rel_path, end)
+                        and (i < last or not self.__directory_only[index] or is_dir())
+                    ):
+                        bests[i] = index
+
+                lowest = min(bests)
+
+        negations = self.__negations
+        return any(best >= 0 and not negations[best] for best in bests)
+
+    def __match_any(self, rel_path, is_dir):
+        best = -1  # Index of last matching rule.
+
+        if self.__has_components:
+            *parents, name = rel_path.split(self.__separator)
+            for parent in parents:
+                for index in self.__component(parent):
+                    if index > best:
+                        best = index  # Parent directory matches, so `is_dir` is irrelevant.
+
+            for index in self.__component(name):
+                if index > best and (not self.__directory_only[index] or is_dir()):
+                    best = index
+
+            if best >= 0:
+                return True
+
+        for index in self.__others:
+            if index <= best:
+                break
+
+            if self.__matches[index](rel_path, is_dir):
+                best = index
+                break
+
+        return best >= 0 and not self.__negations[best]
 
 
 class _IgnoreRule:
-    def __init__(self, regexp, negation, directory_only):
-        self.__regexp = re.compile(regexp)
+    def __init__(self, pattern, anchored, negation, directory_only):
+        self.__pattern = pattern
+        self.__anchored = anchored
         self.__negation = negation
         self.__directory_only = directory_only
-        self.__match = self.__regexp.match
+        self.__regexp = None
+        self.__bytes_regexp = None
+        self.__prefix_regexps = [None, None]  # For `str` and `bytes` paths.
+        self.__match = self.__compile_and_match  # Regular expressions are compiled lazily to make loading cheap.
+        self.__match_bytes = self.__compile_bytes_and_match
+        self.__backtracks = None
+        self.__automata = {}  # Automata of the rule for `str` and `bytes` paths, with and without nesting.
+        self.__prefixes = None  # The last path along with ends of its prefixes which match the pattern.
+
+    def __reduce__(self):
+        return _IgnoreRule, self.state
+
+    @property
+    def state(self):
+        return self.__pattern, self.__anchored, self.__negation, self.__directory_only
 
     @property
     def regexp(self):
+        if self.__regexp is None:
+            self.__regexp = re.compile(
+                _fnmatch_pathname_to_regexp(self.__pattern, self.__anchored, self.__directory_only)
+            )
+            self.__match = self.__regexp.match
+
         return self.__regexp
 
+    @property
+    def bytes_regexp(self):
+        if self.__bytes_regexp is None:
+            # Bytes are matched one by one, like Git does, so `?` matches single byte of multibyte character.
+            self.__bytes_regexp = re.compile(_encode_pattern(self.regexp.pattern))
+            self.__match_bytes = self.__bytes_regexp.match
+
+        return self.__bytes_regexp
+
     @property
     def negation(self):
         return self.__negation
 
+    @property
+    def backtracks(self):
+        if self.__backtracks is None:
+            self.__backtracks = _backtracks(_fnmatch_pathname_tokens(self.__pattern), self.__anchored)
+
+        return self.__backtracks
+
+    def __compile_and_match(self, rel_path):
+        return self.regexp.match(rel_path)
+
+    def __compile_bytes_and_match(self, rel_path):
+        return self.bytes_regexp.match(rel_path)
+
     def match(self, rel_path, is_dir):
         m = self.__match(rel_path)
 
@@ -313,24 +1974,697 @@ class _IgnoreRule:
         # If there is something after slash then it's a directory irrelevant to type of target.
         # `self.directory_only` implies we have group number 1.
         # N.B. Question mark inside a group without a name can shift indices. :(
-        return m and (not self.__directory_only or m.group(1) is not None or is_dir)
+        return m and (not self.__directory_only or m.group(1) is not None or is_dir())
+
+    def match_bytes(self, rel_path, is_dir):
+        m = self.__match_bytes(rel_path)
+        return m and (not self.__directory_only or m.group(1) is not None or is_dir())
+
+    def match_prefix(self, rel_path, end):
+        # Checks whether the pattern matches first `end` characters of the path themselves, not their parent directory.
+        # Type of the target is not checked.
+        regexp = self.__prefix_regexps[0]
+        if regexp is None:
+            regexp = self.__prefix_regexps[0] = re.compile(
+                _fnmatch_pathname_to_regexp(self.__pattern, self.__anchored, self.__directory_only, exact=True)
+            )
+
+        return regexp.fullmatch(rel_path, 0, end)
+
+    def match_prefix_bytes(self, rel_path, end):
+        regexp = self.__prefix_regexps[1]
+        if regexp is None:
+            regexp = self.__prefix_regexps[1] = re.compile(
+                _encode_pattern(
+                    _fnmatch_pathname_to_regexp(self.__pattern, self.__anchored, self.__directory_only, exact=True)
+                )
+            )
+
+        return regexp.fullmatch(rel_path, 0, end)
+
+    def match_linear(self, rel_path, is_dir):
+        # Same as `match()` and `match_bytes()`, but takes linear time with automaton.
+        return self.__automaton(isinstance(rel_path, bytes), True).match(rel_path, is_dir)
+
+    def match_prefix_linear(self, rel_path, end):
+        # Same as `match_prefix()` and `match_prefix_bytes()`, but takes linear time with automaton. Prefixes are
+        # checked for each parent directory of the same path, so all of them are matched at once and kept.
+        prefixes = self.__prefixes
+        if prefixes is None or prefixes[0] is not rel_path:
+            prefixes = (rel_path, self.__automaton(isinstance(rel_path, bytes), False).prefixes(rel_path))
+            self.__prefixes = prefixes
+
+        return end in prefixes[1]
+
+    def __automaton(self, encoded, nested):
+        automaton = self.__automata.get((encoded, nested))
+        if automaton is None:
+            rule = _IgnoreRule(self.__pattern, self.__anchored, False, self.__directory_only)
+            automaton = self.__automata[encoded, nested] = _IgnoreAutomaton([rule], encoded=encoded, nested=nested)
+
+        return automaton
+
+
+class _IgnoreAutomaton:
+    # Matches all the rules at once in linear time with DFA, which is built lazily from NFAs of the rules.
+    #
+    # NFA of a rule has a node before each token of its pattern and a node after the last one (exact match). Tokens
+    # `**/` have additional node for characters preceding the slash. Unanchored patterns start with implicit `**/` token.
+    #
+    # DFA states are sets of NFA nodes, each state knows whether the path is ignored both for files and for directories
+    # by the last matching rule. Slash after ignored directory leads to the state which ignores everything, unless
+    # `nested` is not set, then only the path itself is matched.
+    # If `encoded` is set, paths are `bytes` and patterns are matched against their encoded form byte by byte.
+
+    def __init__(self, rules, encoded=False, nested=True):
+        self.__nested = nested
+        self.__negations = [rule.negation for rule in rules]
+        self.__directory_only = []
+        self.__edges = []  # Tuples `(kind, argument, target)` for each node.
+        self.__skips = []  # Node reachable from each node without consuming characters.
+        self.__exact = {}  # Rule index of each exact match node.
+        starts = []
+
+        for index, rule in enumerate(rules):
+            pattern, anchored, _, directory_only = rule.state
+            if encoded:
+                pattern = _encode_pattern(pattern).decode("latin-1")
+
+            tokens = _fnmatch_pathname_tokens(pattern)
+            if not pattern:
+                tokens = [("**",)]  # See `_fnmatch_pathname_to_regexp()`.
+
+            elif not anchored:
+                tokens.insert(0, ("**/",))
+
+            self.__directory_only.append(directory_only)
+            start = len(self.__edges)
+            end = start + len(tokens)
+            starts.append(start)
+            loops = []
+            for node, (kind, *argument) in enumerate(tokens, start):
+                if kind == "c":
+                    self.__add((("c", argument[0], node + 1),))
+
+                elif kind == "[]":
+                    self.__add((("[]", re.compile(argument[0]).match, node + 1),))
+
+                elif kind == "?":
+                    self.__add((("?", None, node + 1),))
+
+                elif kind == "*":
+                    self.__add((("?", None, node),), node + 1)
+
+                elif kind == "**":
+                    self.__add((("", None, node),), node + 1)
+
+                else:
+                    loops.append(node)
+                    self.__add(None, node + 1)  # Edges are set when the loop node is allocated.
+
+            self.__add(())
+            self.__exact[end] = index
+            for node in loops:
+                loop = len(self.__edges)
+                self.__edges[node] = (("", None, loop),)
+                self.__add((("", None, loop), ("c", "/", node + 1)))
+
+        self.__closures = [None] * len(self.__edges)
+        self.__initial = frozenset(node for start in starts for node in self.__closure(start))
+        self.__reset()
+
+    def __add(self, edges, skip=None):
+        self.__edges.append(edges)
+        self.__skips.append(skip)
+
+    def __closure(self, node):
+        closure = self.__closures[node]
+        if closure is None:
+            skip = self.__skips[node]
+            closure = (node,) if skip is None else (node,) + self.__closure(skip)
+            self.__closures[node] = closure
+
+        return closure
+
+    def __reset(self):
+        self.__states = {}
+        self.__nodes = []
+        self.__transitions = []
+        self.__results = []
+        self.__ignored = self.__state(None)
+        self.__start = self.__state(self.__initial)
+
+    def __state(self, nodes):
+        state = self.__states.get(nodes)
+        if state is None:
+            state = len(self.__transitions)
+            self.__states[nodes] = state
+            self.__nodes.append(nodes)
+            self.__transitions.append({})
+
+            if nodes is None:  # Inside ignored directory.
+                self.__results.append((True, True))
+
+            else:
+                last_file, last_dir = -1, -1
+                for index in sorted(self.__exact[node] for node in nodes if node in self.__exact):
+                    if not self.__directory_only[index]:
+                        last_file = index
+
+                    last_dir = index
+
+                self.__results.append(
+                    (
+                        last_file >= 0 and not self.__negations[last_file],
+                        last_dir >= 0 and not self.__negations[last_dir],
+                    )
+                )
+
+        return state
+
+    def __step(self, state, symbol):
+        c = symbol if isinstance(symbol, str) else chr(symbol)
+        if state == self.__ignored or c == "/" and self.__nested and self.__results[state][1]:
+            self.__transitions[state][symbol] = self.__ignored
+            return self.__ignored
+
+        targets = set()
+        for node in self.__nodes[state]:
+            for kind, argument, target in self.__edges[node]:
+                if (
+                    kind == ""
+                    or (kind == "c" and c == argument)
+                    or (kind == "?" and c != "/")
+                    or (kind == "[]" and argument(c))
+                ):
+                    targets.update(self.__closure(target))
+
+        next_state = self.__state(frozenset(targets))
+        self.__transitions[state][symbol] = next_state
+        return next_state
+
+    def search(self, rel_path):
+        # Returns whether the path is ignored if it is a file and if it is a directory.
+        if len(self.__transitions) > _max_automaton_states:
+            self.__reset()
+
+        transitions = self.__transitions
+        state = self.__start
+        for symbol in rel_path:
+            next_state = transitions[state].get(symbol)
+            if next_state is None:
+                next_state = self.__step(state, symbol)
+            state = next_state
+
+        return self.__results[state]
+
+    def prefixes(self, rel_path):
+        # Returns ends of the path and of its parent directories which are ignored if they are directories.
+        if len(self.__transitions) > _max_automaton_states:
+            self.__reset()
+
+        transitions = self.__transitions
+        results = self.__results
+        separator = b"/"[0] if isinstance(rel_path, bytes) else "/"
+        ends = set()
+        state = self.__start
+        for end, symbol in enumerate(rel_path):
+            if symbol == separator and results[state][1]:
+                ends.add(end)
+
+            next_state = transitions[state].get(symbol)
+            if next_state is None:
+                next_state = self.__step(state, symbol)
+            state = next_state
+
+        if results[state][1]:
+            ends.add(len(rel_path))
+
+        return ends
+
+    def match(self, rel_path, is_dir):
+        ignored_file, ignored_dir = self.search(rel_path)
+        return ignored_file if ignored_file == ignored_dir or not is_dir() else ignored_dir
 
 
 if os.altsep is not None:
-    _all_seps_expr = f"[{re.escape(os.sep)}{re.escape(os.altsep)}]"
-    _path_split = lambda path: re.split(_all_seps_expr, path)
+    _all_seps_expr = re.compile(f"[{re.escape(os.sep)}{re.escape(os.altsep)}]")
+    _all_seps_bytes_expr = re.compile(os.fsencode(_all_seps_expr.pattern))
+    _path_split = lambda path: (_all_seps_expr if isinstance(path, str) else _all_seps_bytes_expr).split(path)
 
 else:
-    _path_split = lambda path: path.split(os.sep)
+    _bytes_sep = os.fsencode(os.sep)
+    _path_split = lambda path: path.split(os.sep if isinstance(path, str) else _bytes_sep)
+
+
+class _IsDirRequired(Exception):
+    pass
+
+
+def _raise_is_dir_required():
+    raise _IsDirRequired()
+
+
+def _walk(matches, directories):
+    while directories:
+        directory = directories.pop()
+        for name, is_dir in _list_directory(directory):
+            entry_path = os.path.join(directory, name)
+            if not matches(entry_path, is_dir=is_dir):
+                if is_dir:
+                    directories.append(entry_path)
+
+                else:
+                    yield entry_path
+
+
+_walk_worker_state = None
+
+_walk_liveness_interval = 1  # Seconds to wait for paths from workers before checking that they are alive.
+
+
+def _walk_initializer(matches, queue):
+    global _walk_worker_state
+    _walk_worker_state = (matches, queue)
+
+
+def _walk_worker(directory, chunk_size):
+    matches, queue = _walk_worker_state
+    try:
+        chunk = []
+        for path in _walk(matches, [directory]):
+            chunk.append(path)
+            if len(chunk) >= chunk_size:
+                queue.put(chunk)
+                chunk = []
+
+        if chunk:
+            queue.put(chunk)
+
+    except Exception as e:
+        queue.put(e)
+
+    queue.put(None)
+
+
+def _list_directory(path):
+    # Returns names of entries of the directory along with flags whether they are directories. Symbolic links are
+    # reported as files, like Git does. Unreadable directories are reported as empty, like `os.walk()` does. Like in
+    # `git ls-files --others`, `.git` is never reported.
+    try:
+        with os.scandir(path) as entries:
+            return [
+                (entry.name, entry.is_dir(follow_symlinks=False)) for entry in entries if entry.name not in _git_names
+            ]
+
+    except OSError:
+        return []
+
+
+def _write_archive(path, opened, arcname, ignore_names):
+    # Writes entries which are prepared and read ahead by the background thread.
+    import queue
+    import shutil
+    import zipfile
+
+    path = os.fsdecode(os.fspath(path))
+    entries = queue.Queue(_max_read_ahead_entries)
+    stop = threading.Event()
+    reader = threading.Thread(target=_read_archive_entries, args=(path, opened, arcname, ignore_names, entries, stop))
+    reader.daemon = True
+    reader.start()
+    try:
+        while True:
+            entry = entries.get()
+            if entry is None:
+                break
+
+            if isinstance(entry, BaseException):
+                raise entry
+
+            entry_path, info, data = entry
+            if isinstance(opened, zipfile.ZipFile):
+                if data is not None:
+                    opened.writestr(info, data)
+
+                else:
+                    with open(entry_path, "rb") as source, opened.open(info, "w") as destination:
+                        shutil.copyfileobj(source, destination)
+
+            elif data is not None:
+                opened.addfile(info, io.BytesIO(data))
+
+            elif info.isreg():
+                with open(entry_path, "rb") as source:
+                    opened.addfile(info, source)
+
+            else:
+                opened.addfile(info)
+
+    finally:
+        stop.set()
+        reader.join()
+
+
+def _read_archive_entries(path, opened, arcname, ignore_names, entries, stop):
+    # Walks the tree and puts paths of entries along with their headers for the archive and contents of small files to
+    # the queue. Then puts `None`, or the exception.
+    import queue
+    import tarfile
+    import zipfile
+
+    def put(entry):
+        while not stop.is_set():
+            try:
+                entries.put(entry, timeout=0.1)
+                return
+
+            except queue.Full:
+                pass
+
+    try:
+        matches = Cache(ignore_names=ignore_names)
+        directories = [path]
+        while directories and not stop.is_set():
+            directory = directories.pop()
+            subdirectories = []
+            for name, is_dir in sorted(_list_directory(directory)):
+                entry_path = os.path.join(directory, name)
+                if matches(entry_path, is_dir=is_dir):
+                    continue
+
+                name = os.path.relpath(entry_path, path)
+                if arcname is not None:
+                    name = os.path.join(arcname, name)
+
+                if isinstance(opened, zipfile.ZipFile):
+                    entry_stat = os.lstat(entry_path)
+                    if stat.S_ISLNK(entry_stat.st_mode):
+                        # Like Info-ZIP does, the target is stored as the contents and the type is kept in attributes.
+                        info = zipfile.ZipInfo(name, time.localtime(entry_stat.st_mtime)[:6])
+                        info.create_system = 3  # Unix.
+                        info.external_attr = (entry_stat.st_mode & 0xFFFF) << 16
+                        put((entry_path, info, os.fsencode(os.readlink(entry_path))))
+                        continue
+
+                    if not stat.S_ISREG(entry_stat.st_mode) and not stat.S_ISDIR(entry_stat.st_mode):
+                        continue  # Pipes, sockets and devices could not be stored.
+
+                    info = zipfile.ZipInfo.from_file(entry_path, name)
+                    info.compress_type = opened.compression
+                    regular, size = not info.is_dir(), info.file_size
+
+                else:
+                    info = opened.gettarinfo(entry_path, name)
+                    if info is None:  # Sockets and other unsupported files.
+                        continue
+
+                    regular, size = info.isreg(), info.size
+
+                data = None
+                if not regular:
+                    data = None if isinstance(opened, tarfile.TarFile) else b""
+
+                elif size <= _read_ahead_size:
+                    with open(entry_path, "rb") as f:
+                        data = f.read()
+
+                    if isinstance(opened, tarfile.TarFile):
+                        info.size = len(data)  # The file could be changed.
+
+                put((entry_path, info, data))
+                if is_dir:
+                    subdirectories.append(entry_path)
+
+            directories.extend(reversed(subdirectories))
+
+        put(None)
+
+    except BaseException as e:
+        put(e)
+
+
+def _copy_file(src, dst):
+    # Copies contents of the file, by the kernel if it is possible.
+    import shutil
 
+    with open(src, "rb") as source, open(dst, "wb") as destination:
+        for kernel_copy in _kernel_copies:
+            try:
+                while kernel_copy(source.fileno(), destination.fileno(), _kernel_copy_size):
+                    pass
 
-def _fnmatch_pathname_to_regexp(pattern, anchored, directory_only):
+                return
+
+            except OSError as e:
+                if e.errno not in _kernel_copy_errors or destination.tell():
+                    raise
+
+        shutil.copyfileobj(source, destination)
+
+
+def _submit_hash_batch(executor, batch, algorithm):
+    # Hashes files of the batch in the pool and sets the future to their placeholders.
+    if batch:
+        future = executor.submit(lambda: [_hash_file(path, algorithm) for path, _ in batch])
+        for _, digest in batch:
+            digest[1] = future
+
+
+def _hash_file(path, algorithm):
+    # Returns digest of contents of the file.
+    import hashlib
+
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_hash_chunk_size), b""):
+            digest.update(chunk)
+
+    return digest.digest()
+
+
+def _rebase_rule(rule, name):
+    # Returns states of rules which match paths inside subdirectory `name` of the base path relative to the
+    # subdirectory, just like rule with state `rule` matches them relative to the base path.
+    key = (rule, name)
+    rebased = _rebased_rules.get(key)
+    if rebased is None:
+        if len(_rebased_rules) >= _max_cached_components:
+            _rebased_rules.clear()
+
+        rebased = _rebased_rules[key] = tuple(_rebase_pattern(rule, name))
+
+    return rebased
+
+
+def _rebase_pattern(rule, name):
+    pattern, anchored, negation, directory_only = rule
+    if not pattern:
+        return [rule]  # Empty pattern matches anything.
+
+    encoded = isinstance(name, bytes)
+    if encoded:  # Like `_IgnoreAutomaton`, bytes are matched one by one.
+        pattern = _encode_pattern(pattern).decode("latin-1")
+        name = name.decode("latin-1")
+
+    offsets = []
+    tokens = _fnmatch_pathname_tokens(pattern, offsets)
+    if not anchored:
+        tokens.insert(0, ("**/",))
+        offsets.insert(0, 0)
+
+    # Simulates NFA of the pattern on the name followed by slash. Its states are pairs of token index and flag whether
+    # `**/` token has consumed something. Then the rest of the pattern from each state is a rebased rule.
+    n = len(tokens)
+
+    def closure(states):
+        for index, looping in list(states):
+            while not looping and index < n and tokens[index][0] in ("*", "**", "**/"):
+                index += 1
+                states.add((index, False))
+
+        return states
+
+    states = closure({(0, False)})
+    for c in f"{name}/":
+        next_states = set()
+        for index, looping in states:
+            if looping:
+                next_states.add((index, True))
+                if c == "/":
+                    next_states.add((index + 1, False))
+
+            elif index < n:
+                kind, *argument = tokens[index]
+                if kind == "c" and c == argument[0] or kind == "?" and c != "/":
+                    next_states.add((index + 1, False))
+
+                elif kind == "[]" and re.match(argument[0], c):
+                    next_states.add((index + 1, False))
+
+                elif kind == "*" and c != "/" or kind == "**":
+                    next_states.add((index, False))
+
+                elif kind == "**/":
+                    next_states.add((index, True))
+
+        states = closure(next_states)
+
+    rebased = {}
+    for index, _ in sorted(states):
+        rest_anchored = index >= n or tokens[index][0] != "**/"
+        if not rest_anchored:
+            index += 1
+
+        if index < n:  # Otherwise the rest could match only the subdirectory itself.
+            rest = pattern[offsets[index] :]
+            if encoded:
+                rest = _decode_pattern(rest.encode("latin-1"))
+
+            if not rebased.get(rest, True):
+                continue  # Unanchored rule with the same pattern matches everything the anchored one does.
+
+            rebased[rest] = rest_anchored
+
+    return [(rest, rest_anchored, negation, directory_only) for rest, rest_anchored in rebased.items()]
+
+
+def _component_expr(pattern):
+    # Returns regular expression which matches single component against unanchored pattern, or `None` if the pattern
+    # could match more than one component.
+    tokens = _fnmatch_pathname_tokens(pattern)
+    return f"{_fnmatch_tokens_to_regexp(tokens)}$" if all(map(_is_component_token, tokens)) else None
+
+
+_rebased_rules = {}
+
+_everything_rules = (("", False, False, False),)  # Rules of directories inside ignored directories.
+
+_max_compiled_rules = 1024
+
+
+def _ignore_file_directory(path, ignore_names):
+    # Returns directory which rules of the ignore file apply to, or `None` if the path is not one of `ignore_names`.
+    parts = path.decoded().parts
+    for ignore_name in ignore_names:
+        name_parts = tuple(ignore_name.split("/"))
+        if parts[-len(name_parts) :] == name_parts:
+            return _Path(parts[: -len(name_parts)])
+
+    return None
+
+
+def _event_paths(event):
+    # Returns paths of the event along with flags whether they are directories, or `None` if it is not known.
+    if isinstance(event, tuple):
+        path, is_dir = event
+        return ((os.fspath(path), is_dir),)
+
+    src_path = getattr(event, "src_path", None)
+    if src_path is None:
+        return ((os.fspath(event), None),)
+
+    is_dir = getattr(event, "is_directory", None)
+    dest_path = getattr(event, "dest_path", None)  # Set only for moved paths.
+    if dest_path:
+        return ((os.fspath(src_path), is_dir), (os.fspath(dest_path), is_dir))
+
+    return ((os.fspath(src_path), is_dir),)
+
+
+def _stat(path):
+    # Returns modification time and size of the file, or `None` if it does not exist.
+    try:
+        stat = os.stat(path)
+
+    except OSError:
+        return None
+
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _snapshot_bisect(data, offset, count, record, key):
+    # Returns index of the first record of the table which string is not less than `key`. Records start with offset
+    # and size of their strings.
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        string, size = record.unpack_from(data, offset + middle * record.size)[:2]
+        if data[string : string + size] < key:
+            low = middle + 1
+
+        else:
+            high = middle
+
+    return low
+
+
+_racy_interval = 2
+
+_kernel_copies = []  # Functions which copy data between file descriptors by the kernel.
+if hasattr(os, "copy_file_range"):
+    _kernel_copies.append(os.copy_file_range)
+
+if hasattr(os, "sendfile") and sys.platform.startswith("linux"):  # Other systems could send files only to sockets.
+    _kernel_copies.append(lambda source, destination, count: os.sendfile(destination, source, None, count))
+
+_kernel_copy_size = 2**30
+
+_max_pending_copies = 1024
+
+_hash_chunk_size = 2**20
+
+_git_names = (".git", b".git")  # Like Git, repository directories and files of submodules are not the contents.
+
+_max_hash_batch_files = 64
+
+_max_hash_batch_size = 2**20
+
+_archive_modes = {"tar": "w|", "gztar": "w|gz", "bztar": "w|bz2", "xztar": "w|xz", "zip": None}
+
+_read_ahead_size = 2**20  # Larger files are not read ahead, but copied in chunks.
+
+_max_read_ahead_entries = 64
+
+_kernel_copy_errors = {errno.EINVAL, errno.ENOSYS, errno.ENOTSOCK, errno.EOPNOTSUPP, errno.EPERM, errno.EXDEV}
+
+_snapshot_magic = b"GISN"
+
+_snapshot_version = 1
+
+# Magic, version, number of directories, offset of entries, offset of strings, which start with the root, and size of
+# the root.
+_snapshot_header = struct.Struct("<4sIQQQQ")
+
+_snapshot_directory = struct.Struct("<QQQQ")  # Path relative to the root, first entry and number of entries.
+
+_snapshot_entry = struct.Struct("<QQI")  # Name and flags.
+
+_snapshot_directory_flag = 1
+
+_snapshot_ignored_flag = 2
+
+_max_automaton_states = 4096
+
+_max_cached_components = 65536
+
+_line_expr = re.compile(b"[^\\n]+\\n?|\\n")
+
+
+def _fnmatch_pathname_to_regexp(pattern, anchored, directory_only, exact=False):
     # Implements `fnmatch` style-behavior, as though with `FNM_PATHNAME` flagged;
     # the path separator will not match shell-style `*` and `.` wildcards.
 
     # Frustratingly, python's fnmatch doesn't provide the FNM_PATHNAME
     # option that `.gitignore`'s behavior depends on.
 
+    # If `exact` is set, the expression is used with `fullmatch()`, and parent directories do not match.
+    if exact:
+        if not pattern:
+            return ".*"
+
+        return f"{'' if anchored else '(?:.+/)?'}{_fnmatch_tokens_to_regexp(_fnmatch_pathname_tokens(pattern))}"
+
     if not pattern:
         if directory_only:
             return "[^/]+(/.+)?$"  # Empty name means no path fragment.
@@ -338,10 +2672,114 @@ def _fnmatch_pathname_to_regexp(pattern, anchored, directory_only):
         else:
             return ".*"
 
+    # Quantifiers which could match slash are lazy, so the pattern matches as short fragment of the path as possible.
+    # Then, if there is a parent directory which matches the pattern, group 1 catches everything after it.
+    res = ["(?:^|.+?/)" if not anchored else "", _fnmatch_tokens_to_regexp(_fnmatch_pathname_tokens(pattern))]
+    if directory_only:  # In this case we are interested if there is something after slash.
+        res.append("(/.+)?$")
+
+    else:
+        res.append("(?:/.+)?$")
+
+    return "".join(res)
+
+
+def _fnmatch_tokens_to_regexp(tokens):
+    res = []
+    for token in tokens:
+        kind = token[0]
+        if kind == "c":
+            res.append(re.escape(token[1]))
+
+        elif kind == "*":
+            res.append("[^/]*")
+
+        elif kind == "**":
+            res.append(".*?")
+
+        elif kind == "**/":
+            res.append("(?:.+?/)??")  # `/**/` matches `/`. The group must not capture, see `_IgnoreRule.match()`.
+
+        elif kind == "?":
+            res.append("[^/]")
+
+        else:
+            res.append(token[1])
+
+    return "".join(res)
+
+
+def _decode_pattern(data):
+    # Like Git, ignore files are UTF-8 regardless of the locale. Invalid bytes are decoded to surrogates, and encoded
+    # back the same way, so they match the same bytes of paths.
+    return data.decode("utf-8", "surrogateescape")
+
+
+def _encode_pattern(pattern):
+    return pattern.encode("utf-8", "surrogateescape")
+
+
+def _simplify_pattern(pattern, anchored):
+    # Returns the pattern which matches the same paths with fewer wildcards: runs of `*` and `?` keep single `*`,
+    # repeated `**/` are merged, and leading `**/` of unanchored pattern is removed.
+    offsets = []
+    tokens = _fnmatch_pathname_tokens(pattern, offsets)
+    offsets.append(len(pattern))
+    kinds, pieces = [], []
+    for i, (kind, *_) in enumerate(tokens):
+        piece = pattern[offsets[i] : offsets[i + 1]]
+        if kind in ("*", "?") and kinds and kinds[-1] in ("*", "?"):
+            if kind == "?" and kinds[-1] == "*":  # `*?` is `?*`.
+                kinds[-1], pieces[-1] = "?", "?"
+                kind, piece = "*", "*"
+
+            elif kind == "*" and kinds[-1] == "*":
+                continue
+
+        elif kind in ("**/", "**") and kinds and kinds[-1] == "**/":  # `**/**/` is `**/`, and `**/**` is `**`.
+            kinds.pop()
+            pieces.pop()
+
+        kinds.append(kind)
+        pieces.append(piece)
+
+    if not anchored and kinds[:1] == ["**/"]:
+        pieces.pop(0)
+
+    return "".join(pieces)
+
+
+def _backtracks(tokens, anchored):
+    # Checks whether regular expression of the pattern could take more than quadratic time. Each wildcard which is
+    # followed by something could backtrack, and multiplies the time by the length of the path for `**`, `**/` and
+    # implicit `**/` of unanchored pattern, or by the length of the component for `*`.
+    wildcards = [kind for kind, *_ in tokens[:-1] if kind in ("*", "**", "**/")]
+    paths = len(wildcards) - wildcards.count("*") + (not anchored)
+    return paths >= 2 or len(wildcards) + (not anchored) >= 3
+
+
+def _is_component_token(token):
+    # Checks whether the token could not match slash.
+    kind = token[0]
+    return kind in ("?", "*", "[]") or (kind == "c" and token[1] != "/")
+
+
+def _fnmatch_pathname_tokens(pattern, offsets=None):
+    # Splits `fnmatch` style pattern into tokens, optionally appending their offsets in the pattern to `offsets`:
+    # - `("c", c)` matches character `c`;
+    # - `("?",)` matches any character except slash;
+    # - `("*",)` matches any number of characters except slash;
+    # - `("**",)` matches any number of any characters;
+    # - `("**/",)` matches either nothing or any characters ending with slash;
+    # - `("[]", expr)` matches characters of regular expression `expr`, except slash.
+
     i, n = 0, len(pattern)
 
-    res = ["(?:^|.+/)" if not anchored else ""]
+    res = []
     while i < n:
+        if offsets is not None:
+            offsets.append(i)
+
         c = pattern[i]
         i += 1
         if c == "*":
@@ -349,16 +2787,16 @@ def _fnmatch_pathname_to_regexp(pattern, anchored, directory_only):
                 i += 1
                 if i < n and pattern[i] == "/":
                     i += 1
-                    res.append("(.+/)?")  # `/**/` matches `/`.
+                    res.append(("**/",))
 
                 else:
-                    res.append(".*")
+                    res.append(("**",))
 
             else:
-                res.append("[^/]*")
+                res.append(("*",))
 
         elif c == "?":
-            res.append("[^/]")
+            res.append(("?",))
 
         elif c == "[":
             j = i
@@ -370,7 +2808,7 @@ def _fnmatch_pathname_to_regexp(pattern, anchored, directory_only):
                 j += 1
 
             if j >= n:
-                res.append("\\[")
+                res.append(("c", "["))
             else:
                 stuff = pattern[i:j].replace("\\", "\\\\")
                 i = j + 1
@@ -378,15 +2816,9 @@ def _fnmatch_pathname_to_regexp(pattern, anchored, directory_only):
                     stuff = f"^{stuff[1:]}"
                 elif stuff[0] == "^":
                     stuff = f"\\{stuff}"
-                res.append(f"[{stuff}]")
+                res.append(("[]", f"(?!/)[{stuff}]"))  # Like in Git, slash is never matched, even by `[!a]`.
 
         else:
-            res.append(re.escape(c))
-
-    if directory_only:  # In this case we are interested if there is something after slash.
-        res.append("(/.+)?$")
+            res.append(("c", c))
 
-    else:
-        res.append("(?:/.+)?$")
-
-    return "".join(res)
+    return res
@@ -8,7 +8,7 @@ with open(f"{os.path.dirname(os.path.abspath(__file__))}/requirements.txt") as r
     with open(f"{os.path.dirname(os.path.abspath(__file__))}/README.md") as readme:
         setuptools.setup(
             name="gitignorefile",
-            version="1.1.2",
+            version="2.0.0",
             description="A spec-compliant `.gitignore` parser for Python",
             long_description=readme.read(),
             long_description_content_type="text/markdown",
@@ -42,4 +42,5 @@ with open(f"{os.path.dirname(os.path.abspath(__file__))}/requirements.txt") as r
             packages=["gitignorefile"],
             scripts=[],
             install_requires=requirements.read().splitlines(),
+            extras_require={"numpy": ["numpy"]},
         )
@@ -1 +1,36 @@
 """Tests."""
+
+import os
+
+
+def make_tree(path):
+    """Makes the tree with ignored files and directories, which is shared by tests of the whole-tree functions.
+
+    Files which are not ignored are `.gitignore`, `main.py`, `src/lib/module.py` and executable `src/script.sh`. All
+    entries are modified at the same fixed time.
+
+    Args:
+        path (str): Root of the tree. It is created.
+    """
+
+    for directory in ["build/lib", "src/lib", "src/__pycache__"]:
+        os.makedirs(f"{path}/{directory}")
+
+    for name, data in [
+        (".gitignore", "build/\n__pycache__/\n*.log\n"),
+        ("main.py", "print('main')\n"),
+        ("debug.log", ""),
+        ("build/lib/module.py", ""),
+        ("src/lib/module.py", "print('module')\n" * 10000),
+        ("src/__pycache__/module.pyc", ""),
+        ("src/script.sh", "#!/bin/sh\n"),
+    ]:
+        with open(f"{path}/{name}", "w") as f:
+            f.write(data)
+
+    os.chmod(f"{path}/src/script.sh", 0o755)
+    for directory, _, names in os.walk(path):
+        for name in names:
+            os.utime(f"{directory}/{name}", (1000000000, 1000000000))
+
+        os.utime(directory, (1000000000, 1000000000))
@@ -0,0 +1,120 @@
+import io
+import os
+import stat
+import tarfile
+import tempfile
+import unittest
+import unittest.mock
+import zipfile
+
+import gitignorefile
+import tests
+
+
+class TestArchive(unittest.TestCase):
+    def test_tar(self):
+        with tempfile.TemporaryDirectory() as d:
+            self.__make_tree(f"{d}/src")
+            os.makedirs(f"{d}/src/.git/objects")
+            with open(f"{d}/src/.git/HEAD", "w") as f:
+                f.write("ref: refs/heads/master\n")
+
+            for format, mode in [("tar", "r:"), ("gztar", "r:gz"), ("bztar", "r:bz2"), ("xztar", "r:xz")]:
+                with self.subTest(format=format):
+                    gitignorefile.archive(f"{d}/src", f"{d}/archive", format=format)
+                    with tarfile.open(f"{d}/archive", mode) as archive:
+                        self.assertEqual(archive.getnames(), self.__names())
+                        self.assertEqual(archive.extractfile("src/lib/module.py").read(), b"print('module')\n" * 10000)
+                        self.assertTrue(archive.getmember("src/script.sh").mode & 0o100)
+                        self.assertTrue(archive.getmember("src").isdir())
+
+            stream = io.BytesIO()
+            gitignorefile.archive(f"{d}/src", stream, format="gztar", arcname="project")
+            with tarfile.open(fileobj=io.BytesIO(stream.getvalue())) as archive:
+                self.assertEqual(archive.getnames(), ["project/" + name for name in self.__names()])
+
+    def test_zip(self):
+        with tempfile.TemporaryDirectory() as d:
+            self.__make_tree(f"{d}/src")
+            gitignorefile.archive(f"{d}/src", f"{d}/archive.zip", format="zip")
+            with zipfile.ZipFile(f"{d}/archive.zip") as archive:
+                self.assertEqual([name.rstrip("/") for name in archive.namelist()], self.__names())
+                self.assertEqual(archive.read("src/lib/module.py"), b"print('module')\n" * 10000)
+                self.assertEqual(archive.getinfo("src/lib/module.py").compress_type, zipfile.ZIP_DEFLATED)
+                self.assertTrue(archive.getinfo("src/").is_dir())
+
+            stream = io.BytesIO()
+            with zipfile.ZipFile(stream, "w") as archive:
+                archive.writestr("README", b"")
+                gitignorefile.archive(f"{d}/src", archive, arcname="project")
+                self.assertIsNone(archive.testzip())  # It is not closed.
+
+            with zipfile.ZipFile(stream) as archive:
+                self.assertEqual(archive.namelist()[0], "README")
+                self.assertEqual(len(archive.namelist()), len(self.__names()) + 1)
+                self.assertEqual(archive.getinfo("project/main.py").compress_type, zipfile.ZIP_STORED)
+
+    def test_special_files(self):
+        with tempfile.TemporaryDirectory() as d:
+            self.__make_tree(f"{d}/src")
+            try:
+                os.symlink("missing", f"{d}/src/dangling")
+                os.symlink("lib", f"{d}/src/src/linkdir")
+
+            except OSError:  # Windows without privileges.
+                self.skipTest("Symbolic links are not supported.")
+
+            if hasattr(os, "mkfifo"):
+                os.mkfifo(f"{d}/src/src/fifo")  # Reading it would block.
+
+            gitignorefile.archive(f"{d}/src", f"{d}/archive.zip", format="zip")
+            with zipfile.ZipFile(f"{d}/archive.zip") as archive:
+                self.assertEqual(
+                    sorted(name.rstrip("/") for name in archive.namelist()),
+                    sorted(self.__names() + ["dangling", "src/linkdir"]),
+                )
+                for name, target in [("dangling", b"missing"), ("src/linkdir", b"lib")]:
+                    with self.subTest(name=name):
+                        self.assertTrue(stat.S_ISLNK(archive.getinfo(name).external_attr >> 16))
+                        self.assertEqual(archive.read(name), target)
+
+            gitignorefile.archive(f"{d}/src", f"{d}/archive.tar")
+            with tarfile.open(f"{d}/archive.tar") as archive:
+                self.assertEqual(archive.getmember("dangling").linkname, "missing")
+                self.assertEqual(archive.getmember("src/linkdir").linkname, "lib")
+                if hasattr(os, "mkfifo"):
+                    self.assertTrue(archive.getmember("src/fifo").isfifo())
+
+    def test_large_files(self):
+        with tempfile.TemporaryDirectory() as d:
+            self.__make_tree(f"{d}/src")
+            with unittest.mock.patch("gitignorefile._read_ahead_size", 100), unittest.mock.patch(
+                "gitignorefile._max_read_ahead_entries", 1
+            ):
+                gitignorefile.archive(f"{d}/src", f"{d}/archive.tar")
+                gitignorefile.archive(f"{d}/src", f"{d}/archive.zip", format="zip")
+
+            with tarfile.open(f"{d}/archive.tar") as archive:
+                self.assertEqual(archive.extractfile("src/lib/module.py").read(), b"print('module')\n" * 10000)
+
+            with zipfile.ZipFile(f"{d}/archive.zip") as archive:
+                self.assertEqual(archive.read("src/lib/module.py"), b"print('module')\n" * 10000)
+
+    def test_errors(self):
+        with tempfile.TemporaryDirectory() as d:
+            self.__make_tree(f"{d}/src")
+            with self.assertRaises(ValueError):
+                gitignorefile.archive(f"{d}/src", f"{d}/archive", format="rar")
+
+            with unittest.mock.patch("zipfile.ZipInfo.from_file", side_effect=PermissionError("Permission denied")):
+                with self.assertRaises(PermissionError):
+                    gitignorefile.archive(f"{d}/src", io.BytesIO(), format="zip")
+
+    @staticmethod
+    def __make_tree(path):
+        tests.make_tree(path)
+        os.makedirs(f"{path}/src/empty")  # Directories without files are archived too.
+
+    @staticmethod
+    def __names():
+        return [".gitignore", "main.py", "src", "src/empty", "src/lib", "src/script.sh", "src/lib/module.py"]
@@ -1,6 +1,7 @@
 import io
 import itertools
 import os
+import pickle
 import stat
 import tempfile
 import unittest
@@ -67,7 +68,7 @@ class TestCache(unittest.TestCase):
                     ],
                 )
 
-                def mock_open(path):
+                def mock_open(path, mode="r"):
                     data = {
                         normalize_path("/home/vladimir/project/directory/%s" % ignore_file_name): ["file.txt"],
                         normalize_path("/home/vladimir/project/%s" % ignore_file_name): ["file2.txt"],
@@ -103,7 +104,7 @@ class TestCache(unittest.TestCase):
                     "/home/vladimir/project/directory/file.txt": True,
                     "/home/vladimir/project/directory/file2.txt": True,
                     "/home/vladimir/project/file.txt": False,
-                    "/home/vladimir/file.txt": False,  # No rules and no `isdir` calls for this file.
+                    "/home/vladimir/file.txt": False,  # No rules for this file.
                 }
 
                 # 9! == 362880 combinations.
@@ -118,12 +119,331 @@ class TestCache(unittest.TestCase):
                                     self.assertEqual(matches(path), expected)
 
                     self.assertEqual(statistics["open"], 2)
-                    self.assertEqual(statistics["isdir"], len(data) - 1)
+                    self.assertEqual(statistics["isdir"], 0)  # No directory-only rules.
                     self.assertEqual(statistics["isfile"], 7)  # Unique path fragments.
 
+    def test_lazy_is_dir(self):
+        with tempfile.TemporaryDirectory() as d:
+            os.makedirs(f"{d}/build")
+            os.makedirs(f"{d}/src")
+            with open(f"{d}/.gitignore", "w") as f:
+                print("*.log", file=f)
+                print("build/", file=f)
+
+            calls = []
+
+            def is_dir(result):
+                return lambda: calls.append(result) or result
+
+            matches = gitignorefile.Cache()
+            self.assertTrue(matches(f"{d}/a.log", is_dir=is_dir(False)))
+            self.assertFalse(matches(f"{d}/a.txt", is_dir=is_dir(False)))
+            self.assertTrue(matches(f"{d}/build/a.txt", is_dir=is_dir(False)))
+            self.assertEqual(calls, [])
+            self.assertTrue(matches(f"{d}/build", is_dir=is_dir(True)))
+            self.assertFalse(matches(f"{d}/src/build", is_dir=is_dir(False)))
+            self.assertEqual(calls, [True, False])
+
+            isdir = os.path.isdir
+            checked = []
+
+            def mock_isdir(path):
+                checked.append(os.path.basename(path))
+                return isdir(path)
+
+            with unittest.mock.patch("os.path.isdir", mock_isdir):
+                entries = {entry.name: entry for entry in os.scandir(d)}
+                self.assertTrue(matches(entries["build"]))
+                self.assertFalse(matches(entries["src"]))
+                self.assertFalse(matches(entries[".gitignore"]))
+                self.assertFalse(matches(f"{d}/src"))
+                self.assertTrue(matches(f"{d}/build"))
+
+            self.assertEqual(checked, ["build"])
+
+    def test_memo(self):
+        with tempfile.TemporaryDirectory() as d:
+            os.makedirs(f"{d}/directory/subdirectory")
+            with open(f"{d}/.gitignore", "w") as f:
+                print("*.log", file=f)
+                print("build/", file=f)
+
+            for memo_size in (0, 1, 3, 100):
+                with self.subTest(memo_size=memo_size):
+                    with open(f"{d}/directory/.gitignore", "w") as f:
+                        print("*.txt", file=f)
+
+                    matches = gitignorefile.Cache(memo_size=memo_size)
+                    paths = [
+                        (f"{d}/a.log", False, True),
+                        (f"{d}/a.txt", False, False),
+                        (f"{d}/build", True, True),
+                        (f"{d}/build", False, False),
+                        (f"{d}/directory/a.txt", False, True),
+                        (f"{d}/directory/subdirectory/a.txt", False, True),
+                        (f"{d}/directory/subdirectory/a.py", False, False),
+                    ]
+                    for _ in range(3):
+                        for path, is_dir, expected in paths:
+                            self.assertEqual(matches(path, is_dir=is_dir), expected)
+
+                    calls = []
+                    self.assertTrue(matches(f"{d}/a.log", is_dir=lambda: calls.append(False)))
+                    self.assertTrue(matches(f"{d}/build", is_dir=lambda: calls.append(True) or True))
+                    self.assertEqual(calls, [True])
+
+                    with open(f"{d}/directory/.gitignore", "w") as f:
+                        print("*.py", file=f)
+
+                    matches.invalidate(f"{d}/directory")
+                    self.assertFalse(matches(f"{d}/directory/a.txt", is_dir=False))
+                    self.assertFalse(matches(f"{d}/directory/subdirectory/a.txt", is_dir=False))
+                    self.assertTrue(matches(f"{d}/directory/subdirectory/a.py", is_dir=False))
+                    self.assertTrue(matches(os.fsencode(f"{d}/directory/subdirectory/a.py"), is_dir=False))
+                    self.assertTrue(matches(f"{d}/a.log", is_dir=False))
+
+                    with open(f"{d}/.gitignore", "w"):
+                        pass
+
+                    matches.invalidate()
+                    self.assertFalse(matches(f"{d}/a.log", is_dir=False))
+                    self.assertFalse(matches(f"{d}/build", is_dir=True))
+
+                    with open(f"{d}/.gitignore", "w") as f:
+                        print("*.log", file=f)
+                        print("build/", file=f)
+
+    def test_precedence(self):
+        with tempfile.TemporaryDirectory() as d:
+            for directory in [".git/info", "src/lib/deep", "doc/a/b"]:
+                os.makedirs(f"{d}/{directory}")
+
+            for name, rules in [
+                (".git/info/exclude", ["*.tmp", "*.bak"]),
+                (".gitignore", ["*.log", "!keep.bak", "/src/*.o", "doc/**/*.md", "/build"]),
+                ("src/.gitignore", ["!important.log", "lib/"]),
+                ("doc/a/.gitignore", ["!*.tmp"]),
+                ("src/lib/deep/.gitignore", ["!*.py"]),  # Not read inside ignored directory.
+            ]:
+                with open(f"{d}/{name}", "w") as f:
+                    for rule in rules:
+                        print(rule, file=f)
+
+            for engine in ("re", "dfa"):
+                matches = gitignorefile.Cache(engine=engine)
+                for path, is_dir, expected in [
+                    ("a.log", False, True),
+                    ("src/a.log", False, True),
+                    ("src/important.log", False, False),  # Deeper ignore file overrides upper one.
+                    ("important.log", False, True),
+                    ("keep.bak", False, False),  # `.gitignore` overrides `.git/info/exclude`.
+                    ("src/keep.bak", False, False),
+                    ("src/a.bak", False, True),
+                    ("src/a.o", False, True),  # Anchored rule of upper ignore file.
+                    ("src/lib/a.o", False, True),
+                    ("src/other/a.o", False, False),
+                    ("a.o", False, False),
+                    ("src/lib", True, True),
+                    ("doc/a/b/a.tmp", False, False),
+                    ("doc/a.tmp", False, True),
+                    ("src/lib/deep/a.py", False, True),
+                    ("src/a.tmp", False, True),
+                    ("doc/readme.md", False, True),
+                    ("doc/a/b/readme.md", False, True),
+                    ("doc/a/b/readme.txt", False, False),
+                    ("src/build", True, False),
+                    ("build/a.txt", False, True),
+                ]:
+                    with self.subTest(engine=engine, path=path):
+                        self.assertEqual(matches(f"{d}/{path}", is_dir=is_dir), expected)
+                        self.assertEqual(matches(os.fsencode(f"{d}/{path}"), is_dir=is_dir), expected)
+
+    def test_impact(self):
+        with tempfile.TemporaryDirectory() as d:
+            for directory in [".git/info", "src/lib", "doc"]:
+                os.makedirs(f"{d}/{directory}")
+
+            paths = [
+                "a.log",
+                "a.tmp",
+                "src/a.log",
+                "src/a.tmp",
+                "src/keep.log",
+                "src/lib/a.log",
+                "src/lib/a.py",
+                "src/lib/keep.log",
+                "src/lib",
+                "doc/a.log",
+            ]
+            for name in paths:
+                if name != "src/lib":
+                    with open(f"{d}/{name}", "w"):
+                        pass
+
+            old = ["*.log", "!keep.log"]
+            for name, rules in [
+                (".git/info/exclude", ["*.tmp"]),
+                (".gitignore", ["doc/"]),
+                ("src/.gitignore", old),
+                ("src/lib/.gitignore", ["!a.log"]),
+            ]:
+                with open(f"{d}/{name}", "w") as f:
+                    for rule in rules:
+                        print(rule, file=f)
+
+            matches = gitignorefile.Cache()
+            before = [matches(f"{d}/{path}") for path in paths]
+            for new, expected in [
+                (old, []),
+                (["# Comment", "*.log", "", "!keep.log"], []),
+                (["!keep.log", "*.log"], ["src/keep.log", "src/lib/keep.log"]),
+                (["*.log"], ["src/keep.log", "src/lib/keep.log"]),
+                (["*.log", "!keep.log", "*.py", "!*.tmp"], ["src/a.tmp", "src/lib/a.py"]),
+                (["lib/"], ["src/a.log", "src/lib/a.log", "src/lib/a.py", "src/lib/keep.log", "src/lib"]),
+                ([], ["src/a.log"]),
+            ]:
+                with self.subTest(new=new):
+                    impact = matches.impact(f"{d}/src/.gitignore", old, new, [f"{d}/{path}" for path in paths])
+                    self.assertEqual(impact, [f"{d}/{path}" for path in expected])
+
+                    with open(f"{d}/src/.gitignore", "w") as f:
+                        for rule in new:
+                            print(rule, file=f)
+
+                    after = [gitignorefile.Cache()(f"{d}/{path}") for path in paths]
+                    self.assertEqual([path for path, a, b in zip(paths, before, after) if a != b], expected)
+
+            self.assertEqual(matches.impact(f"{d}/.git/info/exclude", ["*.tmp"], [], [f"{d}/a.tmp"]), [f"{d}/a.tmp"])
+            with self.assertRaises(ValueError):
+                matches.impact(f"{d}/src/rules.txt", [], ["*"], [f"{d}/src/a.log"])
+
     def test_wrong_symlink(self):
         with tempfile.TemporaryDirectory() as d:
             matches = gitignorefile.Cache()
             os.makedirs(f"{d}/.venv/bin")
             os.symlink(f"/nonexistent-path-{id(self)}", f"{d}/.venv/bin/python")
             self.assertFalse(matches(f"{d}/.venv/bin/python"))
+
+    def test_pickle(self):
+        with tempfile.TemporaryDirectory() as d:
+            os.makedirs(f"{d}/directory")
+            with open(f"{d}/.gitignore", "w") as f:
+                print("*.txt", file=f)
+                print("!keep.txt", file=f)
+
+            matches = gitignorefile.Cache()
+            self.assertTrue(matches(f"{d}/file.txt", is_dir=False))
+
+            with open(f"{d}/.gitignore", "w"):
+                pass  # Restored copy should use rules found before.
+
+            restored = pickle.loads(pickle.dumps(matches))
+            self.assertTrue(restored(f"{d}/directory/file.txt", is_dir=False))
+            self.assertFalse(restored(f"{d}/directory/keep.txt", is_dir=False))
+            self.assertFalse(restored(f"{d}/directory/file.py", is_dir=False))
+
+    def test_bytes(self):
+        with tempfile.TemporaryDirectory() as d:
+            os.makedirs(f"{d}/directory")
+            with open(f"{d}/.gitignore", "wb") as f:
+                f.write(b"*.txt\n!keep.txt\ncaf\xe9/\n")
+
+            matches = gitignorefile.Cache()
+            root = os.fsencode(d)
+            for path, is_dir, expected in [
+                (b"file.txt", False, True),
+                (b"directory/file.txt", False, True),
+                (b"directory/keep.txt", False, False),
+                (b"directory/file.py", False, False),
+                (b"caf\xe9", True, True),
+                (b"caf\xe9", False, False),
+                (b"caf\xe9/file.py", False, True),
+                (b"directory", None, False),
+            ]:
+                with self.subTest(path=path, is_dir=is_dir):
+                    self.assertEqual(matches(root + b"/" + path, is_dir=is_dir), expected)
+                    if os.name != "nt":  # Windows decodes only valid UTF-8.
+                        self.assertEqual(matches(os.fsdecode(root + b"/" + path), is_dir=is_dir), expected)
+
+            if os.name != "nt":  # Windows does not allow arbitrary bytes in file names.
+                with open(root + b"/directory/caf\xe9.py", "w"):
+                    pass
+
+                self.assertEqual(
+                    sorted(gitignorefile.walk(root)),
+                    [os.path.join(root, b".gitignore"), os.path.join(root, b"directory", b"caf\xe9.py")],
+                )
+
+    def test_non_utf8_ignore_file(self):
+        with tempfile.TemporaryDirectory() as d:
+            with open(f"{d}/.gitignore", "wb") as f:
+                f.write(b"caf\xe9\n*.log\n")  # Latin-1.
+
+            fspath = os.fspath  # Like on Windows, where `os.fsdecode()` fails on invalid UTF-8.
+            fsdecode = lambda path: fspath(path).decode("utf-8", "surrogatepass") if isinstance(path, bytes) else path
+            with unittest.mock.patch("os.fsdecode", fsdecode):
+                matches = gitignorefile.Cache()
+                self.assertTrue(matches(f"{d}/main.log", is_dir=False))
+                self.assertFalse(matches(f"{d}/main.py", is_dir=False))
+                self.assertFalse(matches(f"{d}/caf\xe9", is_dir=False))
+
+            matches = gitignorefile.Cache()
+            self.assertTrue(matches(os.fsencode(d) + b"/caf\xe9", is_dir=False))
+            self.assertFalse(matches(os.fsencode(d) + b"/caf\xc3\xa9", is_dir=False))
+
+    def test_repository_root(self):
+        with tempfile.TemporaryDirectory() as d:
+            for directory in ["repository/.git/info", "repository/directory/subdirectory", "other"]:
+                os.makedirs(f"{d}/{directory}")
+
+            for name, rules in [
+                (".gitignore", ["*.txt"]),
+                ("repository/.git/info/exclude", ["*.log"]),
+                ("repository/directory/.gitignore", ["*.tmp"]),
+            ]:
+                with open(f"{d}/{name}", "w") as f:
+                    for rule in rules:
+                        print(rule, file=f)
+
+            isfile = os.path.isfile
+            checked = []
+
+            def mock_isfile(path):
+                checked.append(os.path.relpath(path, d).replace(os.sep, "/"))
+                return isfile(path)
+
+            with unittest.mock.patch("os.path.isfile", mock_isfile):
+                matches = gitignorefile.Cache()
+                self.assertFalse(matches(f"{d}/repository/directory/subdirectory/file.txt", is_dir=False))
+                self.assertTrue(matches(f"{d}/repository/directory/subdirectory/file.log", is_dir=False))
+                self.assertTrue(matches(f"{d}/repository/directory/subdirectory/file.tmp", is_dir=False))
+                self.assertFalse(matches(f"{d}/repository/file.tmp", is_dir=False))
+
+            self.assertEqual(
+                sorted(checked),
+                [
+                    "repository/.git/info/exclude",
+                    "repository/.gitignore",
+                    "repository/directory/.gitignore",
+                    "repository/directory/subdirectory/.gitignore",
+                ],
+            )
+
+            self.assertTrue(matches(f"{d}/other/file.txt", is_dir=False))
+            self.assertFalse(matches(f"{d}/other/file.log", is_dir=False))
+
+    def test_explicit_root(self):
+        with tempfile.TemporaryDirectory() as d:
+            os.makedirs(f"{d}/repository/directory")
+            with open(f"{d}/.gitignore", "w") as f:
+                print("*.txt", file=f)
+
+            with open(f"{d}/repository/.gitignore", "w") as f:
+                print("*.log", file=f)
+
+            matches = gitignorefile.Cache(root=f"{d}/repository")
+            self.assertFalse(matches(f"{d}/repository/directory/file.txt", is_dir=False))
+            self.assertTrue(matches(f"{d}/repository/directory/file.log", is_dir=False))
+            self.assertTrue(matches(os.fsencode(f"{d}/repository/directory/file.log"), is_dir=False))
+            self.assertFalse(matches(f"{d}/file.txt", is_dir=False))
+            self.assertFalse(matches(f"{d}/repository", is_dir=True))
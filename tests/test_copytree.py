@@ -0,0 +1,121 @@
+import errno
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+import unittest.mock
+
+import gitignorefile
+import tests
+
+
+class TestCopytree(unittest.TestCase):
+    def test_copytree(self):
+        with tempfile.TemporaryDirectory() as d:
+            tests.make_tree(f"{d}/src")
+            for workers in (1, 4):
+                with self.subTest(workers=workers):
+                    dst = f"{d}/dst{workers}"
+                    self.assertEqual(gitignorefile.copytree(f"{d}/src", dst, workers=workers), dst)
+                    self.assertEqual(self.__walk(dst), self.__walk_not_ignored(f"{d}/src"))
+                    self.assertEqual(self.__walk(dst), [".gitignore", "main.py", "src/lib/module.py", "src/script.sh"])
+                    with open(f"{dst}/src/lib/module.py") as f:
+                        self.assertEqual(f.read(), "print('module')\n" * 10000)
+
+                    self.assertTrue(os.stat(f"{dst}/src/script.sh").st_mode & stat.S_IXUSR)
+                    self.assertEqual(os.stat(f"{dst}/main.py").st_mtime, 1000000000)
+                    self.assertEqual(os.stat(f"{dst}/src").st_mtime, 1000000000)
+
+            with self.assertRaises(FileExistsError):
+                gitignorefile.copytree(f"{d}/src", f"{d}/dst1")
+
+            os.remove(f"{d}/dst1/main.py")
+            gitignorefile.copytree(f"{d}/src", f"{d}/dst1", dirs_exist_ok=True)
+            self.assertTrue(os.path.isfile(f"{d}/dst1/main.py"))
+
+    def test_destination_inside_source(self):
+        with tempfile.TemporaryDirectory() as d:
+            tests.make_tree(f"{d}/src")
+            gitignorefile.copytree(f"{d}/src", f"{d}/src/src/out")
+            self.assertEqual(
+                self.__walk(f"{d}/src/src/out"), [".gitignore", "main.py", "src/lib/module.py", "src/script.sh"]
+            )
+
+    def test_arguments(self):
+        with tempfile.TemporaryDirectory() as d:
+            tests.make_tree(f"{d}/src")
+            with self.assertRaises(TypeError):
+                gitignorefile.copytree(f"{d}/src", f"{d}/dst", True)  # Like `symlinks` of `shutil.copytree()`.
+
+            with unittest.mock.patch("shutil.copystat", side_effect=ValueError("Not an `OSError`.")):
+                with self.assertRaises(ValueError):
+                    gitignorefile.copytree(f"{d}/src", f"{d}/dst")
+
+    @unittest.skipUnless(hasattr(os, "mkfifo"), "Named pipes are not supported.")
+    def test_named_pipe(self):
+        with tempfile.TemporaryDirectory() as d:
+            tests.make_tree(f"{d}/src")
+            os.mkfifo(f"{d}/src/src/fifo")  # Reading it would block.
+            with self.assertRaises(shutil.Error) as context:
+                gitignorefile.copytree(f"{d}/src", f"{d}/dst", workers=1)
+
+            with self.assertRaises(shutil.Error) as expected:
+                shutil.copytree(f"{d}/src", f"{d}/shutil")
+
+            self.assertEqual(
+                context.exception.args[0],
+                [(f"{d}/src/src/fifo", f"{d}/dst/src/fifo", f"`{d}/src/src/fifo` is a named pipe")],
+            )
+            self.assertEqual([error[2] for error in expected.exception.args[0]], [context.exception.args[0][0][2]])
+            self.assertEqual(self.__walk(f"{d}/dst"), [".gitignore", "main.py", "src/lib/module.py", "src/script.sh"])
+
+    def test_without_kernel_copy(self):
+        def fail(*_):
+            raise OSError(errno.ENOSYS, "Function not implemented")
+
+        with tempfile.TemporaryDirectory() as d:
+            tests.make_tree(f"{d}/src")
+            with unittest.mock.patch("gitignorefile._kernel_copies", [fail]):
+                gitignorefile.copytree(f"{d}/src", f"{d}/dst")
+
+            self.assertEqual(self.__walk(f"{d}/dst"), self.__walk_not_ignored(f"{d}/src"))
+            with open(f"{d}/dst/src/lib/module.py") as f:
+                self.assertEqual(f.read(), "print('module')\n" * 10000)
+
+    def test_symlinks(self):
+        with tempfile.TemporaryDirectory() as d:
+            tests.make_tree(f"{d}/src")
+            try:
+                os.symlink("lib", f"{d}/src/src/link")
+                os.symlink("missing", f"{d}/src/dangling")
+
+            except OSError:  # Windows without privileges.
+                self.skipTest("Symbolic links are not supported.")
+
+            gitignorefile.copytree(f"{d}/src", f"{d}/links", symlinks=True)
+            self.assertEqual(os.readlink(f"{d}/links/src/link"), "lib")
+            self.assertEqual(os.readlink(f"{d}/links/dangling"), "missing")
+
+            gitignorefile.copytree(f"{d}/src", f"{d}/copies", ignore_dangling_symlinks=True)
+            self.assertFalse(os.path.islink(f"{d}/copies/src/link"))
+            self.assertTrue(os.path.isfile(f"{d}/copies/src/link/module.py"))
+            self.assertFalse(os.path.lexists(f"{d}/copies/dangling"))
+
+            with self.assertRaises(shutil.Error) as context:
+                gitignorefile.copytree(f"{d}/src", f"{d}/errors")
+
+            self.assertEqual([error[0] for error in context.exception.args[0]], [f"{d}/src/dangling"])
+            self.assertTrue(os.path.isfile(f"{d}/errors/main.py"))
+
+    @staticmethod
+    def __walk(path):
+        return sorted(
+            os.path.relpath(os.path.join(directory, name), path).replace(os.sep, "/")
+            for directory, _, names in os.walk(path)
+            for name in names
+        )
+
+    @staticmethod
+    def __walk_not_ignored(path):
+        return sorted(os.path.relpath(x, path).replace(os.sep, "/") for x in gitignorefile.walk(path))
@@ -0,0 +1,99 @@
+import random
+import sys
+import time
+import unittest
+import warnings
+
+import gitignorefile
+
+# Patterns which regular expressions backtrack on, along with paths of maximal length which make them do it.
+ADVERSARIAL = [
+    (["**/a*a*a*a*a*/**/b"], "/".join(["a" * 250] * 16) + "/c"),
+    (["*a*a*a*a*a*b"], "a" * 4000),
+    (["a*a*a*a*a*a*/c"], "a" * 4000 + "/d"),
+    (["**/*a*a*a*/**/*a*a*a*/b"], "/".join(["a" * 250] * 16)),
+    (["**/**/**/**/**/**/b"], "/".join(["a"] * 2000)),
+    (["a/**/b/**/c/**/d/**/e"], "/".join(["a", "b", "c", "d"] * 500)),
+    (["**/a/**/b"], "/".join(["a"] * 2000)),
+    (["*?*?*?*?*?*?x"], "a" * 4000),
+    (["[a]*[a]*[a]*[a]*[a]*b"], "a" * 4000),
+    (["*a*b", "docs/**/*.md"], "a" * 4000),
+    (["*a*b", "docs/**/*.md"], "docs/" + "/".join(["a" * 250] * 16)),
+]
+
+
+class TestEngine(unittest.TestCase):
+    def test_same_results(self):
+        random.seed(0)
+        fragments = ["a", "b", "/", "*", "**", "?", "[ab]", "[!a]", "[", "\\", "!", "/**/", "**/", "/**", " "]
+        names = ["a", "b", "ab", "ba", "[", "]", "\\", "é", " "]
+        for _ in range(300):
+            lines = ["".join(random.choices(fragments, k=random.randint(1, 6))) for _ in range(random.randint(1, 4))]
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", FutureWarning)  # Nested sets in character classes.
+                specs = [gitignorefile.IgnoreSpec.from_lines(lines, "/home", engine=e) for e in ("re", "dfa")]
+                for _ in range(10):
+                    path = "/".join(random.choices(names, k=random.randint(1, 4)))
+                    for is_dir in (False, True):
+                        for p in (f"/home/{path}", f"/home/{path}".encode()):
+                            with self.subTest(lines=lines, path=p, is_dir=is_dir):
+                                self.assertEqual(*(bool(spec.match(p, is_dir=is_dir)) for spec in specs))
+
+    def test_long_path(self):
+        spec = gitignorefile.IgnoreSpec.from_lines(["a/**/b/**/c/**/d/**/e"], "/home", engine="dfa")
+        path = "/home/" + "/".join(["a"] * 10000)
+        start = time.perf_counter()
+        self.assertFalse(spec.match(path, is_dir=False))
+        self.assertTrue(spec.match(path + "/b/c/d/e", is_dir=False))
+        self.assertLess(time.perf_counter() - start, 5.0)
+
+    def test_adversarial(self):
+        for rules, path in ADVERSARIAL:
+            for lines in (rules, rules + ["!z"]):  # Negations disable some shortcuts.
+                for engine in ("re", "dfa"):
+                    spec = gitignorefile.IgnoreSpec.from_lines(lines, "/home", engine=engine)
+                    for p in (f"/home/{path}", f"/home/{path}".encode()):
+                        with self.subTest(lines=lines, engine=engine, bytes=isinstance(p, bytes)):
+                            start = time.perf_counter()
+                            self.assertFalse(spec.match(p, is_dir=False))
+                            self.assertLess(time.perf_counter() - start, 1.0)
+
+    def test_simplified_patterns(self):
+        for lines, simplified in [
+            (["**/**/b"], ["b"]),
+            (["a/**/**/**/c"], ["a/**/c"]),
+            (["a/**/**"], ["a/**"]),
+            (["*?*?x"], ["??*x"]),
+            (["[*]*?"], ["[*]?*"]),
+        ]:
+            with self.subTest(lines=lines):
+                self.assertEqual(
+                    gitignorefile.IgnoreSpec.from_lines(lines, "/home"),
+                    gitignorefile.IgnoreSpec.from_lines(simplified, "/home"),
+                )
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            gitignorefile.IgnoreSpec.from_lines(["*.py"], "/home", engine="unknown")
+
+
+def benchmark():
+    # Prints the worst time of matching adversarial path for each engine.
+    for rules, path in ADVERSARIAL:
+        times = []
+        for engine in ("re", "dfa"):
+            elapsed = 0.0
+            for lines in (rules, rules + ["!z"]):
+                spec = gitignorefile.IgnoreSpec.from_lines(lines, "/home", engine=engine)
+                for p in (f"/home/{path}", f"/home/{path}".encode()):
+                    start = time.perf_counter()
+                    spec.match(p, is_dir=False)
+                    elapsed = max(elapsed, time.perf_counter() - start)
+
+            times.append(f"{engine}: {elapsed * 1000:.1f} ms")
+
+        print(f"{rules} on {len(path)} characters: {', '.join(times)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import types
+import unittest
+import unittest.mock
+
+import gitignorefile
+
+
+class TestEventFilter(unittest.TestCase):
+    def test_filter(self):
+        with tempfile.TemporaryDirectory() as d:
+            for directory in [".git", "build/lib", "src"]:
+                os.makedirs(f"{d}/{directory}")
+
+            with open(f"{d}/.gitignore", "w") as f:
+                f.write("build/\n*.log\n")
+
+            events = gitignorefile.EventFilter()
+            with unittest.mock.patch("os.path.isdir", side_effect=AssertionError("Type of the path is checked.")):
+                self.assertEqual(
+                    events.filter(
+                        [
+                            (f"{d}/src/main.py", False),
+                            (f"{d}/src/debug.log", False),
+                            (os.fsencode(f"{d}/src/main.py"), False),
+                            self.__event(f"{d}/src/main.py"),  # Duplicate.
+                            self.__event(f"{d}/src/old.py", f"{d}/src/new.py"),
+                            self.__event(f"{d}/src/deleted", is_directory=True),
+                            self.__event(f"{d}/build/lib/main.o"),
+                            (f"{d}/build", True),
+                        ]
+                    ),
+                    [
+                        f"{d}/src/main.py",
+                        os.fsencode(f"{d}/src/main.py"),
+                        f"{d}/src/old.py",
+                        f"{d}/src/new.py",
+                        f"{d}/src/deleted",
+                    ],
+                )
+
+            self.assertEqual(
+                events.filter([f"{d}/src/other.py", f"{d}/src", f"{d}/build"]), [f"{d}/src/other.py", f"{d}/src"]
+            )
+
+            call = gitignorefile.Cache.__call__
+            with unittest.mock.patch.object(gitignorefile.Cache, "__call__", autospec=True, side_effect=call) as mock:
+                self.assertEqual(events.filter([(f"{d}/build/lib/deep/{i}.o", False) for i in range(100)]), [])
+                self.assertEqual(mock.call_count, 0)  # Directory `build/lib` is known to be ignored.
+
+            with open(f"{d}/.gitignore", "w") as f:
+                f.write("*.py\n")
+
+            self.assertEqual(
+                events.filter(
+                    [(f"{d}/src/main.py", False), (f"{d}/build/lib/main.o", False), (f"{d}/.gitignore", False)]
+                ),
+                [f"{d}/build/lib/main.o", f"{d}/.gitignore"],
+            )
+
+    @staticmethod
+    def __event(src_path, dest_path="", is_directory=False):
+        # Looks like events of `watchdog`.
+        return types.SimpleNamespace(src_path=src_path, dest_path=dest_path, is_directory=is_directory)
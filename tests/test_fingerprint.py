@@ -0,0 +1,77 @@
+import marshal
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+import gitignorefile
+import tests
+
+
+class TestFingerprint(unittest.TestCase):
+    def test_fingerprint(self):
+        with tempfile.TemporaryDirectory() as d:
+            tests.make_tree(d)
+            expected = gitignorefile.fingerprint(d)
+            self.assertEqual(len(expected), 64)
+            self.assertEqual(gitignorefile.fingerprint(d, workers=1), expected)
+            self.assertEqual(gitignorefile.fingerprint(os.fsencode(d)), expected)
+            self.assertEqual(len(gitignorefile.fingerprint(d, algorithm="sha1")), 40)
+
+            os.makedirs(f"{d}/.git/objects")
+            for name in [
+                "debug.log",
+                "build/lib/module.py",
+                "src/__pycache__/module.pyc",
+                "build/new.py",
+                ".git/index",
+                ".git/objects/pack",
+            ]:
+                with self.subTest(name=name):
+                    with open(f"{d}/{name}", "w") as f:
+                        f.write("changed")
+
+                    self.assertEqual(gitignorefile.fingerprint(d), expected)
+
+            fingerprints = {expected}
+            for change in [
+                lambda: self.__write(f"{d}/src/lib/module.py", "print('changed')\n"),
+                lambda: os.chmod(f"{d}/main.py", 0o755) if os.name != "nt" else os.remove(f"{d}/src/script.sh"),
+                lambda: os.rename(f"{d}/main.py", f"{d}/renamed.py"),
+                lambda: os.makedirs(f"{d}/src/empty"),
+                lambda: self.__write(f"{d}/src/empty/main.py", ""),
+                lambda: self.__write(f"{d}/.gitignore", "build/\n__pycache__/\n"),
+            ]:
+                change()
+                fingerprint = gitignorefile.fingerprint(d)
+                self.assertNotIn(fingerprint, fingerprints)
+                fingerprints.add(fingerprint)
+
+    def test_digests(self):
+        with tempfile.TemporaryDirectory() as d:
+            tests.make_tree(d)
+            digests = {}
+            expected = gitignorefile.fingerprint(d, digests)
+            self.assertEqual(len(digests), 4)  # Only files which are not ignored.
+            digests = marshal.loads(marshal.dumps(digests))
+
+            with unittest.mock.patch("gitignorefile._hash_file", side_effect=AssertionError("File is read.")):
+                self.assertEqual(gitignorefile.fingerprint(d, digests), expected)
+
+            self.__write(f"{d}/src/lib/module.py", "print('changed')\n")
+            os.utime(f"{d}/src/lib/module.py", (1000000000, 1000000000))
+            os.remove(f"{d}/main.py")
+            with unittest.mock.patch("gitignorefile._hash_file", wraps=gitignorefile._hash_file) as mock:
+                self.assertNotEqual(gitignorefile.fingerprint(d, digests), expected)
+                self.assertEqual(mock.call_args_list, [unittest.mock.call(f"{d}/src/lib/module.py", "sha256")])
+
+            self.assertEqual(len(digests), 3)
+
+            self.__write(f"{d}/new.py", "")  # Modified just now.
+            gitignorefile.fingerprint(d, digests)
+            self.assertEqual(len(digests), 3)
+
+    @staticmethod
+    def __write(path, data):
+        with open(path, "w") as f:
+            f.write(data)
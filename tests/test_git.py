@@ -0,0 +1,249 @@
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+import gitignorefile
+
+
+class GitHarness:
+    """Builds repositories and compares verdicts of `git check-ignore` with verdicts of `gitignorefile.Cache`."""
+
+    def __init__(self, root):
+        self.root = root
+        self.environment = dict(os.environ, HOME=root, XDG_CONFIG_HOME=root, GIT_CONFIG_NOSYSTEM="1")
+        self.repository = os.path.join(root, "repository")
+        self.__git("init", "-q", self.repository, cwd=root)
+
+    def write(self, path, data=None):
+        path = os.path.join(self.repository, *path.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(data or "")
+
+    def paths(self):
+        # Returns all the paths in the repository, relative to it, along with flags whether they are directories.
+        paths = []
+        for directory, directories, files in os.walk(self.repository):
+            if directory == self.repository:
+                directories.remove(".git")
+
+            rel_path = os.path.relpath(directory, self.repository).replace(os.sep, "/")
+            for names, is_dir in ((directories, True), (files, False)):
+                for name in names:
+                    paths.append((name if rel_path == "." else f"{rel_path}/{name}", is_dir))
+
+        return sorted(paths)
+
+    def git(self, paths):
+        # Returns verdicts of `git check-ignore`, along with number of seconds spent.
+        start = time.perf_counter()
+        output = self.__git(
+            "check-ignore", "--stdin", "-v", "--non-matching", "-z", input="".join(f"{path}\0" for path in paths)
+        )
+        elapsed = time.perf_counter() - start
+
+        fields = output.split("\0")
+        verdicts = {}
+        for i in range(0, len(fields) - 1, 4):
+            source, _, pattern, path = fields[i : i + 4]
+            verdicts[path] = bool(source) and not pattern.startswith("!")
+
+        return [verdicts[path] for path in paths], elapsed
+
+    def cache(self, paths, engine="re"):
+        # Returns verdicts of `gitignorefile.Cache`, along with number of seconds spent.
+        start = time.perf_counter()
+        matches = gitignorefile.Cache(engine=engine)
+        verdicts = [matches(os.path.join(self.repository, *path.split("/")), is_dir=is_dir) for path, is_dir in paths]
+        return verdicts, time.perf_counter() - start
+
+    def __git(self, *args, input=None, cwd=None):
+        process = subprocess.run(
+            ("git",) + args,
+            input=input,
+            cwd=cwd or self.repository,
+            env=self.environment,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        # `git check-ignore` exits with 1 when none of the paths are ignored.
+        if process.returncode not in (0, 1):
+            raise subprocess.CalledProcessError(process.returncode, ("git",) + args)
+
+        return process.stdout
+
+
+def random_pattern(generator):
+    # Patterns use features which Git and `gitignorefile` treat the same. Backslash escapes are not supported.
+    segments = ["a", "b", "ab", "x.c", "*", "*.c", "*.o", "a?", "?", "[ab]*", "[!a]", "[a-c]b", "**"]
+    pattern = "/".join(generator.choice(segments) for _ in range(generator.randint(1, 3)))
+    if generator.random() < 0.2:
+        pattern = f"/{pattern}"
+
+    if generator.random() < 0.2:
+        pattern = f"{pattern}/"
+
+    if generator.random() < 0.2:
+        pattern = f"!{pattern}"
+
+    return pattern
+
+
+def random_repository(harness, generator):
+    names = ["a", "b", "ab", "x.c", "x.o", "c"]
+    directories = [""]
+    for _ in range(generator.randint(1, 30)):
+        parent = generator.choice(directories)
+        path = f"{parent}{generator.choice(names)}"
+        if generator.random() < 0.4:
+            if not os.path.isfile(os.path.join(harness.repository, *path.split("/"))):
+                directories.append(f"{path}/")
+                os.makedirs(os.path.join(harness.repository, *path.split("/")), exist_ok=True)
+
+        elif not os.path.isdir(os.path.join(harness.repository, *path.split("/"))):
+            harness.write(path)
+
+    ignore_files = [".git/info/exclude"] + [f"{directory}.gitignore" for directory in directories]
+    for ignore_file in generator.sample(ignore_files, generator.randint(1, min(3, len(ignore_files)))):
+        rules = [random_pattern(generator) for _ in range(generator.randint(1, 5))]
+        harness.write(ignore_file, "".join(f"{rule}\n" for rule in rules))
+
+
+CORPUS = {
+    ".gitignore": [
+        "# Byte-compiled / optimized / DLL files",
+        "__pycache__/",
+        "*.py[cod]",
+        "*$py.class",
+        "build/",
+        "dist/",
+        "*.egg-info/",
+        ".venv",
+        "node_modules/",
+        "npm-debug.log*",
+        "/coverage",
+        "*.log",
+        "!important.log",
+        "target/",
+        "*.class",
+        ".idea/",
+        "*.iml",
+        "out/",
+        "docs/_build/",
+        "**/generated/**",
+        "!/generated/keep.txt",
+        ".DS_Store",
+    ],
+    "src/.gitignore": ["*.tmp", "!keep.tmp", "/local/", "cache*/"],
+    "src/app/.gitignore": ["!*.log", "fixtures/*.json", "!fixtures/keep.json"],
+    ".git/info/exclude": ["*.swp", "scratch/"],
+}
+
+CORPUS_PATHS = [
+    "setup.py",
+    "main.pyc",
+    "src/__pycache__/module.cpython-38.pyc",
+    "src/module.py",
+    "src/module.pyo",
+    "src/a.tmp",
+    "src/keep.tmp",
+    "src/local/file.txt",
+    "src/app/local/file.txt",
+    "src/app/debug.log",
+    "src/app/fixtures/data.json",
+    "src/app/fixtures/keep.json",
+    "src/app/fixtures/nested/data.json",
+    "src/cache1/file",
+    "build/lib/module.py",
+    "dist/package.tar.gz",
+    "package.egg-info/PKG-INFO",
+    ".venv/bin/python",
+    "node_modules/left-pad/index.js",
+    "npm-debug.log.1",
+    "coverage/index.html",
+    "src/coverage/index.html",
+    "debug.log",
+    "important.log",
+    "target/classes/Main.class",
+    "Main.class",
+    ".idea/workspace.xml",
+    "project.iml",
+    "out/production/Main.class",
+    "docs/_build/html/index.html",
+    "docs/index.rst",
+    "generated/keep.txt",
+    "generated/file.txt",
+    "src/generated/deep/file.txt",
+    ".DS_Store",
+    "src/.DS_Store",
+    "notes.swp",
+    "scratch/notes.txt",
+]
+
+
+@unittest.skipIf(shutil.which("git") is None, "Git is not installed.")
+class TestGit(unittest.TestCase):
+    def test_corpus(self):
+        with tempfile.TemporaryDirectory() as d:
+            harness = GitHarness(d)
+            for path, rules in CORPUS.items():
+                harness.write(path, "".join(f"{rule}\n" for rule in rules))
+
+            for path in CORPUS_PATHS:
+                harness.write(path)
+
+            self.__compare(harness)
+
+    def test_random(self):
+        generator = random.Random(0)
+        for seed in range(100):
+            with self.subTest(seed=seed):
+                with tempfile.TemporaryDirectory() as d:
+                    harness = GitHarness(d)
+                    random_repository(harness, generator)
+                    self.__compare(harness)
+
+    def __compare(self, harness):
+        paths = harness.paths()
+        expected, _ = harness.git([path for path, _ in paths])
+        for engine in ("re", "dfa"):
+            verdicts, _ = harness.cache(paths, engine=engine)
+            mismatches = [path for path, a, b in zip(paths, verdicts, expected) if a != b]
+            self.assertEqual(mismatches, [], self.__rules(harness))
+
+    @staticmethod
+    def __rules(harness):
+        rules = []
+        for path, is_dir in harness.paths() + [(".git/info/exclude", False)]:
+            if not is_dir and path.split("/")[-1] in (".gitignore", "exclude"):
+                with open(os.path.join(harness.repository, *path.split("/"))) as f:
+                    rules.append(f"{path}: {f.read().split()}")
+
+        return "\n".join(rules)
+
+
+def benchmark(repositories=20, seed=0):
+    # Prints number of paths per second checked by Git and by `gitignorefile.Cache` on random repositories.
+    generator = random.Random(seed)
+    count, elapsed = 0, {"git": 0.0, "re": 0.0, "dfa": 0.0}
+    for _ in range(repositories):
+        with tempfile.TemporaryDirectory() as d:
+            harness = GitHarness(d)
+            random_repository(harness, generator)
+            paths = harness.paths()
+            count += len(paths)
+            elapsed["git"] += harness.git([path for path, _ in paths])[1]
+            for engine in ("re", "dfa"):
+                elapsed[engine] += harness.cache(paths, engine=engine)[1]
+
+    for name, seconds in elapsed.items():
+        print(f"{name}: {count / seconds:.0f} paths per second", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -9,6 +9,8 @@ import gitignorefile
 
 
 class TestMatch(unittest.TestCase):
+    engine = "re"
+
     def test_simple(self):
         matches = self.__parse_gitignore_string(["__pycache__/", "*.py[cod]"], mock_base_path="/home/michael")
         for is_dir in (False, True):
@@ -303,8 +305,9 @@ class TestMatch(unittest.TestCase):
                 self.assertTrue(matches("/home/michael/oo", is_dir=is_dir))
                 self.assertTrue(matches("/home/michael/foo", is_dir=is_dir))
                 self.assertTrue(matches("/home/michael/foo/ar", is_dir=is_dir))
-                self.assertFalse(matches("/home/michael/foo/bar", is_dir=is_dir))
-                self.assertFalse(matches("/home/michael/foo/bar/hey", is_dir=is_dir))
+                # Like Git, files inside ignored directory `foo` could not be re-included.
+                self.assertTrue(matches("/home/michael/foo/bar", is_dir=is_dir))
+                self.assertTrue(matches("/home/michael/foo/bar/hey", is_dir=is_dir))
 
     def test_exclude_from_subdirectory(self):
         matches = self.__parse_gitignore_string(
@@ -465,11 +468,8 @@ class TestMatch(unittest.TestCase):
                 self.assertTrue(matches("/home/robert/test__pycache__/excluded", is_dir=is_dir))
                 self.assertTrue(matches("/home/robert/test__pycache__/excluded/excluded", is_dir=is_dir))
                 self.assertTrue(matches("/home/robert/test__pycache__/excluded/excluded/excluded.txt", is_dir=is_dir))
-                # This file will actually be ignored by Git because it won't go into ignored directory
-                # `test__pycache__` while globbing. If you are globbing through the directory tree, check that parent
-                # directory is not ignored (`!/foo`, `/foo/*`, `!/foo/bar`) and if it is, don't call `matches` on
-                # nested file.
-                self.assertFalse(matches("/home/robert/test__pycache__/excluded/excluded/test_inverse"))
+                # Like Git, files inside ignored directory `test__pycache__` could not be re-included.
+                self.assertTrue(matches("/home/robert/test__pycache__/excluded/excluded/test_inverse"))
                 self.assertFalse(matches("/home/robert/hello.pyc"))
                 self.assertTrue(matches("/home/robert/test__pycache__/some_file.txt", is_dir=is_dir))
                 self.assertTrue(matches("/home/robert/test__pycache__/test", is_dir=is_dir))
@@ -491,6 +491,27 @@ class TestMatch(unittest.TestCase):
         self.assertFalse(matches("/home/robert/.test_venv", is_dir=False))
         self.assertTrue(matches("/home/robert/.test_venv", is_dir=True))
 
+    def test_basename_deep(self):
+        matches = self.__parse_gitignore_string(
+            ["*.log", "build", "!keep.log", "tmp/", "/src/*.tmp"], mock_base_path="/home/michael"
+        )
+        for is_dir in (False, True):
+            with self.subTest(i=is_dir):
+                self.assertTrue(matches("/home/michael/a/b/c/d/e/f/debug.log", is_dir=is_dir))
+                self.assertFalse(matches("/home/michael/a/b/c/d/e/f/keep.log", is_dir=is_dir))
+                self.assertTrue(matches("/home/michael/a/b/build/d/e/f/keep.py", is_dir=is_dir))
+                self.assertTrue(matches("/home/michael/a/b/tmp/d/e/f/keep.py", is_dir=is_dir))
+                self.assertTrue(matches("/home/michael/a/b/tmp/tmp", is_dir=is_dir))
+                self.assertFalse(matches("/home/michael/a/b/c/d/e/f/main.py", is_dir=is_dir))
+                self.assertTrue(matches("/home/michael/src/a.tmp", is_dir=is_dir))
+                self.assertFalse(matches("/home/michael/a/src/a.tmp", is_dir=is_dir))
+        self.assertFalse(matches("/home/michael/a/b/tmp", is_dir=False))
+        self.assertTrue(matches("/home/michael/a/b/tmp", is_dir=True))
+
     def __parse_gitignore_string(self, data, mock_base_path):
-        with unittest.mock.patch("builtins.open", lambda _: io.StringIO("\n".join(data))):
-            return gitignorefile.parse(f"{mock_base_path}/.gitignore", base_path=mock_base_path)
+        with unittest.mock.patch("builtins.open", lambda *_: io.StringIO("\n".join(data))):
+            return gitignorefile.parse(f"{mock_base_path}/.gitignore", base_path=mock_base_path, engine=self.engine)
+
+
+class TestMatchAutomaton(TestMatch):
+    engine = "dfa"
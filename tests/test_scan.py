@@ -0,0 +1,134 @@
+import os
+import tempfile
+import time
+import unittest
+import unittest.mock
+
+import gitignorefile
+
+
+class TestScanner(unittest.TestCase):
+    def test_scan(self):
+        with tempfile.TemporaryDirectory() as d:
+            for directory in ["root/build", "root/src/lib/deep", "root/src/other"]:
+                os.makedirs(f"{d}/{directory}")
+
+            for name in ["main.py", "main.pyc", "build/main.py", "src/lib/module.py", "src/lib/deep/debug.log"]:
+                with open(f"{d}/root/{name}", "w"):
+                    pass
+
+            self.__write(f"{d}/root/.gitignore", "build/\n*.pyc\n")
+            self.__write(f"{d}/root/src/lib/.gitignore", "*.log\n")
+            self.__age(f"{d}/root")
+
+            scanner = gitignorefile.Scanner(f"{d}/root")
+            listed = []
+            list_directory = gitignorefile._list_directory
+
+            def mock_list_directory(path):
+                listed.append(os.path.relpath(path, f"{d}/root").replace(os.sep, "/"))
+                return list_directory(path)
+
+            def scan():
+                del listed[:]
+                with unittest.mock.patch("gitignorefile._list_directory", mock_list_directory):
+                    result = sorted(os.path.relpath(x, f"{d}/root").replace(os.sep, "/") for x in scanner.scan())
+
+                self.assertEqual(result, sorted(self.__walk(f"{d}/root")))
+                return result
+
+            expected = [".gitignore", "main.py", "src/lib/.gitignore", "src/lib/module.py"]
+            self.assertEqual(scan(), expected)
+            self.assertEqual(sorted(listed), [".", "src", "src/lib", "src/lib/deep", "src/other"])
+
+            self.assertEqual(scan(), expected)
+            self.assertEqual(listed, [])
+
+            with open(f"{d}/root/src/other/new.py", "w"):
+                pass
+
+            self.__age(f"{d}/root/src/other", 50)
+            self.assertEqual(scan(), sorted(expected + ["src/other/new.py"]))
+            self.assertEqual(listed, ["src/other"])
+
+            self.__write(f"{d}/root/src/lib/.gitignore", "*.py\n")
+            self.assertEqual(
+                scan(), [".gitignore", "main.py", "src/lib/.gitignore", "src/lib/deep/debug.log", "src/other/new.py"]
+            )
+            self.assertEqual(sorted(listed), ["src/lib", "src/lib/deep"])
+
+            self.__write(f"{d}/.gitignore", "*.log\n")  # Outside of the tree.
+            self.assertEqual(scan(), [".gitignore", "main.py", "src/lib/.gitignore", "src/other/new.py"])
+            self.assertEqual(sorted(listed), [".", "src", "src/lib", "src/lib/deep", "src/other"])
+
+            self.assertEqual(scan(), [".gitignore", "main.py", "src/lib/.gitignore", "src/other/new.py"])
+            self.assertEqual(listed, [])
+
+    def test_invalidate_once_per_subtree(self):
+        with tempfile.TemporaryDirectory() as d:
+            for i in range(20):
+                os.makedirs(f"{d}/{i}/a/b")
+                self.__write(f"{d}/{i}/a/.gitignore", "*.log\n")
+
+            self.__age(d)
+            scanner = gitignorefile.Scanner(d)
+            with unittest.mock.patch.object(scanner.cache, "invalidate", wraps=scanner.cache.invalidate) as mock:
+                self.assertEqual(len(list(scanner.scan())), 20)
+                self.assertEqual(mock.call_args_list, [unittest.mock.call()])  # Forgets everything at once.
+
+                mock.reset_mock()
+                list(scanner.scan())
+                self.assertEqual(mock.call_args_list, [])
+
+                os.makedirs(f"{d}/new/a/b")
+                self.__write(f"{d}/0/a/.gitignore", "*.py\n")
+                self.__age(d)
+                mock.reset_mock()
+                list(scanner.scan())
+                self.assertEqual(
+                    sorted(mock.call_args_list), [unittest.mock.call(f"{d}/0/a"), unittest.mock.call(f"{d}/new")]
+                )
+
+    def test_git_directory(self):
+        with tempfile.TemporaryDirectory() as d:
+            os.makedirs(f"{d}/.git/objects/ab")
+            self.__write(f"{d}/.git/HEAD", "ref: refs/heads/master\n")
+            self.__write(f"{d}/main.py", "")
+            self.__age(d)
+
+            scanner = gitignorefile.Scanner(d)
+            self.assertEqual(list(scanner.scan()), [os.path.join(d, "main.py")])
+
+            self.__write(f"{d}/.git/objects/ab/cdef", "")
+            self.__write(f"{d}/.git/index", "")
+            with unittest.mock.patch("gitignorefile._list_directory", wraps=gitignorefile._list_directory) as mock:
+                self.assertEqual(list(scanner.scan()), [os.path.join(d, "main.py")])
+                self.assertEqual(mock.call_args_list, [])
+
+    def test_racy_directory(self):
+        with tempfile.TemporaryDirectory() as d:
+            scanner = gitignorefile.Scanner(d)
+            self.assertEqual(list(scanner.scan()), [])
+
+            stat = os.stat(d)
+            with open(f"{d}/file.txt", "w"):
+                pass
+
+            os.utime(d, ns=(stat.st_atime_ns, stat.st_mtime_ns))  # Directory is changed within the same tick.
+            self.assertEqual(list(scanner.scan()), [os.path.join(d, "file.txt")])
+
+    @staticmethod
+    def __write(path, data):
+        with open(path, "w") as f:
+            f.write(data)
+
+    @staticmethod
+    def __age(path, seconds=100):
+        # Modification times which are too recent are not trusted.
+        timestamp = time.time() - seconds
+        for directory, _, _ in os.walk(path):
+            os.utime(directory, (timestamp, timestamp))
+
+    @staticmethod
+    def __walk(path):
+        return [os.path.relpath(x, path).replace(os.sep, "/") for x in gitignorefile.walk(path)]
@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+
+import gitignorefile
+
+
+class TestSnapshot(unittest.TestCase):
+    def test_snapshot(self):
+        with tempfile.TemporaryDirectory() as d:
+            for directory in ["root/build/output", "root/src/lib", "root/src-x", "root/src/build", "root/.git/objects"]:
+                os.makedirs(f"{d}/{directory}")
+
+            for name in [
+                "main.py",
+                "main.pyc",
+                "build/output/main.pyc",
+                "src/build/result.txt",
+                "src/lib/module.py",
+                "src/lib/debug.log",
+                "src-x/a.py",
+                ".git/HEAD",
+            ]:
+                with open(f"{d}/root/{name}", "w"):
+                    pass
+
+            with open(f"{d}/root/.gitignore", "w") as f:
+                print("build/", file=f)
+                print("*.py[cod]", file=f)
+                print("*.log", file=f)
+
+            root = f"{d}/root"
+            gitignorefile.Snapshot.write(f"{d}/snapshot", root)
+            with gitignorefile.Snapshot(f"{d}/snapshot") as snapshot:
+                for path, expected in [
+                    ("main.py", False),
+                    ("main.pyc", True),
+                    ("build", True),
+                    ("build/output", True),
+                    ("build/output/main.pyc", True),
+                    ("src", False),
+                    ("src/build/result.txt", True),
+                    ("src/lib/module.py", False),
+                    ("src/lib/debug.log", True),
+                    ("src-x/a.py", False),
+                    (".gitignore", False),
+                    ("", False),
+                ]:
+                    with self.subTest(path=path):
+                        self.assertEqual(snapshot.ignored(f"{root}/{path}"), expected)
+                        self.assertEqual(snapshot.ignored(os.fsencode(f"{root}/{path}")), expected)
+                        self.assertEqual(gitignorefile.Cache()(f"{root}/{path}"), expected)
+
+                for path in [
+                    f"{root}/unknown.py",
+                    f"{root}/src/unknown/a.py",
+                    f"{root}/main.py/a.py",
+                    d,
+                    f"{root}/.git",  # Like in Git, it is not the contents of the tree.
+                    f"{root}/.git/HEAD",
+                ]:
+                    with self.subTest(path=path):
+                        with self.assertRaises(KeyError):
+                            snapshot.ignored(path)
+
+                self.assertEqual(sorted(snapshot.files()), sorted(gitignorefile.walk(root)))
+                self.assertEqual(sorted(snapshot.files(f"{root}/src")), [os.path.join(root, "src", "lib", "module.py")])
+                self.assertEqual(
+                    list(snapshot.files(os.fsencode(f"{root}/src-x"))), [os.fsencode(f"{root}/src-x/a.py")]
+                )
+                self.assertEqual(list(snapshot.files(f"{root}/build")), [])
+                self.assertEqual(list(snapshot.files(f"{root}/src/lib/module.py")), [])
+                self.assertEqual(list(snapshot.files(d)), [])
+
+                with open(f"{root}/src/lib/new.py", "w"):
+                    pass
+
+                gitignorefile.Snapshot.write(f"{d}/snapshot", root)  # The old one is still mapped.
+                self.assertFalse(snapshot.ignored(f"{root}/main.py"))
+                with self.assertRaises(KeyError):
+                    snapshot.ignored(f"{root}/src/lib/new.py")
+
+            with gitignorefile.Snapshot(f"{d}/snapshot") as snapshot:
+                self.assertFalse(snapshot.ignored(f"{root}/src/lib/new.py"))
+
+    def test_not_snapshot(self):
+        with tempfile.TemporaryDirectory() as d:
+            with open(f"{d}/file", "wb") as f:
+                f.write(b"*.log\n")
+
+            with self.assertRaises(ValueError):
+                gitignorefile.Snapshot(f"{d}/file")
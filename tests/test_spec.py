@@ -0,0 +1,132 @@
+import io
+import marshal
+import mmap
+import os
+import pickle
+import tempfile
+import unittest
+import unittest.mock
+
+import gitignorefile
+
+
+class TestSpec(unittest.TestCase):
+    def test_from_lines(self):
+        spec = gitignorefile.IgnoreSpec.from_lines(["__pycache__/\n", "*.py[cod]\r\n", "!keep.pyc"], "/home/michael")
+        self.assertFalse(spec.match("/home/michael/main.py", is_dir=False))
+        self.assertTrue(spec.match("/home/michael/main.pyc", is_dir=False))
+        self.assertFalse(spec.match("/home/michael/keep.pyc", is_dir=False))
+        self.assertTrue(spec("/home/michael/__pycache__", is_dir=True))
+        self.assertFalse(spec("/home/michael/__pycache__", is_dir=False))
+        self.assertFalse(spec("/home/heather/main.pyc", is_dir=False))
+
+    def test_parse_lines(self):
+        for lines in (["*.log", "!keep.log"], [b"*.log\n", b"!keep.log\n"], io.BytesIO(b"*.log\n!keep.log\n")):
+            with self.subTest(lines=lines):
+                spec = gitignorefile.parse_lines(lines, "/home/michael")
+                self.assertTrue(spec.match("/home/michael/a.log", is_dir=False))
+                self.assertFalse(spec.match("/home/michael/keep.log", is_dir=False))
+
+    def test_parse_bytes(self):
+        data = b"\xef\xbb\xbf*.log\r\n\r\n# comment\nbuild/\r\ncaf\xe9\n!keep.log"
+        name = b"caf\xe9".decode("utf-8", "surrogateescape")
+        expected = gitignorefile.IgnoreSpec.from_lines(["*.log", "build/", name, "!keep.log"], "/home")
+        with tempfile.TemporaryFile() as f:
+            f.write(data)
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for buffer in (data, bytearray(data), memoryview(data), mapped):
+                    with self.subTest(buffer=type(buffer)):
+                        spec = gitignorefile.parse_bytes(buffer, "/home")
+                        self.assertEqual(spec, expected)
+                        self.assertTrue(spec.match("/home/a.log", is_dir=False))
+                        self.assertFalse(spec.match("/home/keep.log", is_dir=False))
+                        self.assertTrue(spec.match("/home/build", is_dir=True))
+                        self.assertTrue(spec.match(f"/home/{name}", is_dir=False))
+
+    def test_match_many(self):
+        spec = gitignorefile.IgnoreSpec.from_lines(["*.log", "build/"], "/home/michael")
+        self.assertEqual(
+            spec.match_many(["/home/michael/a.log", "/home/michael/a.txt", "/home/michael/build/a.txt"], is_dir=False),
+            [True, False, True],
+        )
+
+    def test_match_array(self):
+        spec = gitignorefile.IgnoreSpec.from_lines(
+            ["*.log", "!keep.log", "build/", "/data/*/tmp", "doc/**/*.md", "part-*", "!part-0"], "/home/michael"
+        )
+        paths = [
+            "a.log",
+            "keep.log",
+            "src/keep.log",
+            "build",
+            "src/build/a.txt",
+            "data/2024/tmp",
+            "data/2024/tmp/a.txt",
+            "data/2024/01/tmp",
+            "doc/a/b/readme.md",
+            "doc/readme.txt",
+            "data/2024/part-0",
+            "data/2024/part-1",
+            "data/2025/part-1",
+            "data/2025/part-0",
+        ]
+        is_dir = [False, False, False, True, False, True, False, True, False, False, False, False, False, False]
+        expected = [spec.match(f"/home/michael/{path}", is_dir=d) for path, d in zip(paths, is_dir)]
+        self.assertEqual(expected.count(True), 8)
+        self.assertEqual(spec.match_array(paths, is_dir), expected)
+        self.assertEqual(spec.match_array([os.fsencode(path) for path in paths], is_dir), expected)
+        self.assertEqual(spec.match_array(paths), [spec.match(f"/home/michael/{path}", is_dir=False) for path in paths])
+
+        try:
+            import numpy
+
+        except ImportError:
+            return
+
+        for array in (
+            numpy.array(paths),
+            numpy.array(paths, dtype=object),
+            numpy.array([os.fsencode(path) for path in paths]),
+        ):
+            with self.subTest(dtype=array.dtype):
+                result = spec.match_array(array, numpy.array(is_dir))
+                self.assertIsInstance(result, numpy.ndarray)
+                self.assertEqual(result.tolist(), expected)
+
+        self.assertEqual(spec.match_array(numpy.array([], dtype=str)).tolist(), [])
+
+    def test_parse(self):
+        with unittest.mock.patch("builtins.open", lambda *_: io.StringIO("*.log\n")):
+            spec = gitignorefile.parse("/home/michael/.gitignore")
+
+        self.assertIsInstance(spec, gitignorefile.IgnoreSpec)
+        self.assertEqual(spec, gitignorefile.IgnoreSpec.from_lines(["*.log"], "/home/michael"))
+
+    def test_serialization(self):
+        spec = gitignorefile.IgnoreSpec.from_lines(["*.log", "!keep.log", "/build/", "doc/**/*.md"], "/home/michael")
+        spec.match("/home/michael/a.log", is_dir=False)  # Compiled rules should not affect serialized form.
+        for restored in (pickle.loads(pickle.dumps(spec)), gitignorefile.IgnoreSpec.loads(spec.dumps())):
+            with self.subTest(restored=restored):
+                self.assertEqual(restored, spec)
+                self.assertEqual(hash(restored), hash(spec))
+                self.assertEqual(
+                    restored.match_many(
+                        [
+                            "/home/michael/a.log",
+                            "/home/michael/keep.log",
+                            "/home/michael/build",
+                            "/home/michael/src/build",
+                            "/home/michael/doc/a/b/readme.md",
+                            "/home/michael/readme.md",
+                        ],
+                        is_dir=True,
+                    ),
+                    [True, False, True, False, True, False],
+                )
+
+        self.assertIsInstance(marshal.loads(spec.dumps()), tuple)
+        self.assertNotEqual(spec, gitignorefile.IgnoreSpec.from_lines(["*.log"], "/home/michael"))
+        self.assertNotEqual(
+            spec, gitignorefile.IgnoreSpec.from_lines(["*.log", "!keep.log", "/build/", "doc/**/*.md"], "/home")
+        )
@@ -0,0 +1,114 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+import gitignorefile
+
+
+class TestWalk(unittest.TestCase):
+    def test_walk(self):
+        with tempfile.TemporaryDirectory() as d:
+            self.__make_tree(d)
+            for processes in (None, 1, 2):
+                with self.subTest(processes=processes):
+                    result = gitignorefile.walk(d, processes=processes, chunk_size=1)
+                    self.assertEqual(
+                        sorted(os.path.relpath(x, d).replace(os.sep, "/") for x in result), self.__expected
+                    )
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == "fork", "Workers do not inherit mocks.")
+    def test_dead_worker(self):
+        with tempfile.TemporaryDirectory() as d:
+            self.__make_tree(d)
+            with unittest.mock.patch("gitignorefile._walk", side_effect=lambda *args: os._exit(1)):
+                with unittest.mock.patch("gitignorefile._walk_liveness_interval", 0.1):
+                    with self.assertRaises(RuntimeError):
+                        list(gitignorefile.walk(d, processes=2))
+
+    def test_awalk(self):
+        with tempfile.TemporaryDirectory() as d:
+            self.__make_tree(d)
+
+            async def walk():
+                return sorted([os.path.relpath(path, d).replace(os.sep, "/") async for path in gitignorefile.awalk(d)])
+
+            self.assertEqual(self.__run(walk()), self.__expected)
+
+    def test_awalk_many_trees(self):
+        with tempfile.TemporaryDirectory() as d:
+            for i in range(5):
+                self.__make_tree(f"{d}/{i}")
+
+            async def walk(root):
+                return sorted(
+                    [os.path.relpath(path, root).replace(os.sep, "/") async for path in gitignorefile.awalk(root)]
+                )
+
+            async def walk_all():
+                return await asyncio.gather(*(walk(f"{d}/{i}") for i in range(5)))
+
+            self.assertEqual(self.__run(walk_all()), [self.__expected] * 5)
+
+    def test_aignored(self):
+        with tempfile.TemporaryDirectory() as d:
+            self.__make_tree(d)
+            matches = gitignorefile.Cache()
+            paths = [
+                "main.py",
+                "main.pyc",
+                "build",
+                "src/build",
+                "src/lib/module.pyc",
+                "src/lib/debug.log",
+                "src/lib/module.py",
+            ]
+
+            async def check():
+                return [await matches.aignored(f"{d}/{path}") for path in paths]
+
+            self.assertEqual(self.__run(check()), [False, True, True, True, True, True, False])
+            self.assertEqual(self.__run(check()), [gitignorefile.Cache()(f"{d}/{path}") for path in paths])
+
+    __expected = [
+        ".gitignore",
+        "main.py",
+        "src/lib/.gitignore",
+        "src/lib/module.py",
+    ]
+
+    def __make_tree(self, d):
+        for directory in ["build/output", "src/build", "src/lib", ".git/objects/ab"]:
+            os.makedirs(f"{d}/{directory}")
+
+        for name in [
+            "main.py",
+            "main.pyc",
+            "build/output/main.pyc",
+            "src/build/result.txt",
+            "src/lib/module.py",
+            "src/lib/module.pyc",
+            "src/lib/debug.log",
+            ".git/HEAD",
+            ".git/objects/ab/cdef",
+        ]:
+            with open(f"{d}/{name}", "w"):
+                pass
+
+        with open(f"{d}/.gitignore", "w") as f:
+            print("build/", file=f)
+            print("*.py[cod]", file=f)
+
+        with open(f"{d}/src/lib/.gitignore", "w") as f:
+            print("*.log", file=f)
+
+    @staticmethod
+    def __run(coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+
+        finally:
+            loop.close()